@@ -0,0 +1,112 @@
+'''Compose many Markov chain texts at once with NumPy
+
+skills:
+    - numpy vectorization
+    - searchsorted over a flattened CSR graph
+
+additions / modifications:
+    - every walker advances in the same step: one call draws all the uniforms
+      and one searchsorted resolves all the next vertices
+    - the per-vertex cumulative weights are shifted by the total weight of all
+      earlier vertices, which makes them one sorted array for the whole graph:
+        vertex v owns the values [base[v], base[v] + total[v])
+    - a walker that reaches a vertex with no outgoing edges restarts at a
+      uniformly random vertex
+'''
+import numpy as np
+
+from compact import CompactGraph
+
+class BatchComposer:
+    """Vectorized view of a graph for batch composition
+
+    Properties:
+        _labels: vertex id -> label, as an object array
+        _targets: target vertex id of each edge
+        _bounds: the graph-wide cumulative weights (one sorted array)
+        _base: first value owned by each vertex
+        _totals: total outgoing weight of each vertex
+    """
+    def __init__(self, graph):
+        """Precompute the arrays for a graph
+
+        Args:
+            graph (Graph | CompactGraph): the graph to compose from
+        """
+        if not isinstance(graph, CompactGraph):
+            graph = CompactGraph.from_graph(graph)
+
+        (offsets, targets, cumulative) = graph.csr
+        offsets = np.frombuffer(offsets, dtype=np.uint64).astype(np.int64)
+        cumulative = np.frombuffer(cumulative, dtype=np.uint64).astype(np.int64)
+        degrees = np.diff(offsets)
+
+        self._labels = np.array(list(graph.labels), dtype=object)
+        self._targets = np.frombuffer(targets, dtype=np.uint32)
+        self._totals = np.zeros(len(degrees), dtype=np.int64)
+        has_edges = degrees > 0
+        self._totals[has_edges] = cumulative[offsets[1:][has_edges] - 1]
+        self._base = np.concatenate(([0], np.cumsum(self._totals)[:-1])).astype(np.int64)
+        self._bounds = cumulative + np.repeat(self._base, degrees)
+
+    def walk(self, count, length=100, seed=None):
+        """Advance `count` independent walkers `length` steps
+
+        Args:
+            count (int): number of compositions
+            length (int, optional): words per composition. Defaults to 100.
+            seed (int, optional): seed for the random generator. Defaults to None.
+
+        Returns:
+            numpy.ndarray: (count, length) vertex ids
+        """
+        rng = np.random.default_rng(seed)
+        num_vertices = len(self._labels)
+        paths = np.empty((count, length), dtype=np.int64)
+        if num_vertices == 0 or length == 0:
+            return paths[:, :0]
+
+        last_edge = max(len(self._targets) - 1, 0)
+        state = rng.integers(num_vertices, size=count)
+        for step in range(length):
+            paths[:, step] = state
+            if step == length - 1:
+                break
+
+            totals = self._totals[state]
+            values = self._base[state] + np.minimum((rng.random(count) * totals).astype(np.int64), totals - 1)
+            edges = np.minimum(np.searchsorted(self._bounds, values, side='right'), last_edge)
+            state = self._targets[edges].astype(np.int64) if len(self._targets) else np.zeros(count, dtype=np.int64)
+
+            dead = totals == 0
+            if dead.any():
+                state[dead] = rng.integers(num_vertices, size=int(dead.sum()))
+
+        return paths
+
+    def compose(self, count, length=100, seed=None):
+        """Compose `count` texts
+
+        Args:
+            count (int): number of compositions
+            length (int, optional): words per composition. Defaults to 100.
+            seed (int, optional): seed for the random generator. Defaults to None.
+
+        Returns:
+            list: one list of words per composition
+        """
+        return self._labels[self.walk(count, length, seed)].tolist()
+
+def compose_batch(graph, count, length=100, seed=None):
+    """Compose `count` texts from a graph
+
+    Args:
+        graph (Graph | CompactGraph): the graph to compose from
+        count (int): number of compositions
+        length (int, optional): words per composition. Defaults to 100.
+        seed (int, optional): seed for the random generator. Defaults to None.
+
+    Returns:
+        list: one list of words per composition
+    """
+    return BatchComposer(graph).compose(count, length, seed)
@@ -0,0 +1,321 @@
+"""Compact Markov Chain Graph
+
+A drop-in alternative to graph.Graph for large corpora.
+
+skills:
+    - string interning
+    - CSR (compressed sparse row) adjacency
+    - the array module
+
+additions / modifications:
+    - labels are interned to integer ids, a vertex is just (id, label)
+    - edges are counted first, then finalized into flat arrays:
+        offsets[v] .. offsets[v+1] is the slice of edges leaving vertex v
+        targets[e] is the vertex id at the end of edge e
+        cumulative[e] is the running total of the weights in that slice
+    - an edge costs 12 bytes once finalized instead of a dict entry + int object
+    - same get_vertex / connect_to / get_next_node / update surface as graph.Graph
+    - update() keeps new edges pending in a small overflow row per vertex; a
+      stale vertex samples from its CSR slice plus that row, and the arrays are
+      only rebuilt on finalize() or once the pending edges pass compact_every
+
+"""
+
+import bisect
+import random
+from array import array
+from collections import namedtuple
+
+CompactVertex = namedtuple('CompactVertex', ['id', 'label'])
+
+def csr_from_counts(counts, num_rows):
+    """Build CSR arrays from a dict of packed (row, target) edge counts
+
+    Args:
+        counts (dict): {(row << 32) | target: weight}
+        num_rows (int): number of rows (vertices) in the result
+
+    Returns:
+        tuple: offsets, targets, cumulative arrays
+    """
+    offsets = array('Q', [0]) * (num_rows + 1)
+    targets = array('I')
+    cumulative = array('Q')
+    row = 0
+    total = 0
+    for key in sorted(counts):
+        src = key >> 32
+        while row < src:
+            row += 1
+            offsets[row] = len(targets)
+            total = 0
+        total += counts[key]
+        targets.append(key & 0xFFFFFFFF)
+        cumulative.append(total)
+
+    while row < num_rows:
+        row += 1
+        offsets[row] = len(targets)
+
+    return offsets, targets, cumulative
+
+def csr_to_counts(offsets, targets, cumulative):
+    """Unpack CSR arrays back into a dict of packed (row, target) edge counts
+
+    Args:
+        offsets, targets, cumulative: arrays as returned by csr_from_counts
+
+    Returns:
+        dict: {(row << 32) | target: weight}
+    """
+    counts = {}
+    for row in range(len(offsets) - 1):
+        previous = 0
+        for edge in range(offsets[row], offsets[row + 1]):
+            counts[(row << 32) | targets[edge]] = cumulative[edge] - previous
+            previous = cumulative[edge]
+
+    return counts
+
+def sample_row(offsets, targets, cumulative, row, rng=random):
+    """Draw a weighted random target from one CSR row
+
+    Args:
+        row (int): the row (vertex id) to draw from
+        rng (random.Random, optional): source of randomness. Defaults to the random module.
+
+    Returns:
+        int: target id, or None if the row has no edges
+    """
+    lo = offsets[row]
+    hi = offsets[row + 1]
+    if lo == hi:
+        return None
+
+    value = rng.random() * cumulative[hi - 1]
+    return targets[bisect.bisect_right(cumulative, value, lo, hi - 1)]
+
+class CompactGraph:
+    """Compact (interned, array-backed) graph object
+
+    Properties:
+        _ids: label -> vertex id
+        _labels: vertex id -> label
+        _pending: vertex id -> {target id: count} edges not finalized yet
+                  (the overflow row of each stale vertex)
+        _pending_totals: vertex id -> total weight in its overflow row
+        _num_pending: number of pending edges
+        _compact_every: finalize once this many edges are pending (None: only on demand)
+        _last: id of the last word folded in by update()
+        _offsets, _targets, _cumulative: the finalized CSR arrays
+    """
+    def __init__(self, compact_every=None):
+        self._ids = {}
+        self._labels = []
+        self._pending = {}
+        self._pending_totals = {}
+        self._num_pending = 0
+        self._compact_every = compact_every
+        self._last = None
+        self._offsets, self._targets, self._cumulative = csr_from_counts({}, 0)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Copy a graph.Graph into a new CompactGraph
+
+        Args:
+            graph (Graph): the dict-backed graph
+
+        Returns:
+            CompactGraph: finalized copy of the graph
+        """
+        compact = cls()
+        for vertex in graph:
+            compact._intern(vertex.label)
+        for vertex in graph:
+            for (target, weight) in zip(vertex.edges, vertex.weights):
+                compact.connect_to(vertex.label, target.label, weight)
+        compact.last = graph.last
+
+        return compact.finalize()
+
+    @classmethod
+    def from_arrays(cls, labels, offsets, targets, cumulative, last_id=None):
+        """Wrap existing CSR arrays (e.g. memory-mapped ones) without copying
+
+        Args:
+            labels (sequence): vertex id -> label
+            offsets, targets, cumulative: finalized CSR arrays (or memoryviews)
+            last_id (int, optional): id of the last word folded in. Defaults to None.
+
+        Returns:
+            CompactGraph: graph over the given arrays
+        """
+        compact = cls()
+        compact._ids = None
+        compact._labels = labels
+        compact._offsets = offsets
+        compact._targets = targets
+        compact._cumulative = cumulative
+        # kept as an id: going through the last setter would build _ids right away
+        compact._last = last_id
+        return compact
+
+    def __repr__(self):
+        self.finalize()
+        graph = ''
+        for vertex_id, label in enumerate(self._labels):
+            graph += label + ' -> [\n'
+            previous = 0
+            for edge in range(self._offsets[vertex_id], self._offsets[vertex_id + 1]):
+                graph += f'\t( {self._labels[self._targets[edge]]} = {self._cumulative[edge] - previous} )\n'
+                previous = self._cumulative[edge]
+            graph += ']\n'
+
+        return graph
+
+    def __len__(self):
+        return len(self._labels)
+
+    @property
+    def vertices(self):
+        return set(self._labels)
+
+    @property
+    def last(self):
+        return None if self._last is None else self._labels[self._last]
+
+    @last.setter
+    def last(self, label):
+        self._last = None if label is None else self._intern(label)
+
+    @property
+    def last_id(self):
+        return self._last
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def csr(self):
+        # finalized (offsets, targets, cumulative) arrays
+        self.finalize()
+        return self._offsets, self._targets, self._cumulative
+
+    @property
+    def num_edges(self):
+        self.finalize()
+        return len(self._targets)
+
+    def _intern(self, label):
+        if self._ids is None:
+            # label lookups on a loaded model are built on first use
+            self._ids = {vertex_label: vertex_id for (vertex_id, vertex_label) in enumerate(self._labels)}
+
+        vertex_id = self._ids.get(label)
+        if vertex_id is None:
+            if not isinstance(self._labels, list):
+                self._labels = list(self._labels)
+            vertex_id = len(self._labels)
+            self._ids[label] = vertex_id
+            self._labels.append(label)
+
+        return vertex_id
+
+    def get_vertex(self, label):
+        # interning adds the label if it isn't in the graph yet
+        return CompactVertex(self._intern(label), label)
+
+    def _add_pending(self, src, dst, weight):
+        row = self._pending.get(src)
+        if row is None:
+            row = self._pending[src] = {}
+        if dst not in row:
+            self._num_pending += 1
+        row[dst] = row.get(dst, 0) + weight
+        self._pending_totals[src] = self._pending_totals.get(src, 0) + weight
+
+    def connect_to(self, vertex1, vertex2, weight=1):
+        src = vertex1.id if isinstance(vertex1, CompactVertex) else self._intern(vertex1)
+        dst = vertex2.id if isinstance(vertex2, CompactVertex) else self._intern(vertex2)
+        self._add_pending(src, dst, weight)
+
+    def update(self, labels):
+        """Fold more words into the graph
+
+        The last word is carried over, so calling update() on consecutive
+        batches builds the same graph as one call on the whole text. The new
+        edges go into the overflow rows of the vertices that gained one; every
+        other vertex keeps sampling from the finalized arrays alone.
+
+        Args:
+            labels (iterable): the words, in order
+        """
+        src = self._last
+        for label in labels:
+            dst = self._intern(label)
+            if src is not None:
+                self._add_pending(src, dst, 1)
+                if self._compact_every and self._num_pending >= self._compact_every:
+                    self.finalize()
+            src = dst
+
+        self._last = src
+
+    def finalize(self):
+        """Fold the counting phase into the CSR arrays
+
+        Returns:
+            CompactGraph: self, so calls can be chained
+        """
+        if self._pending or len(self._offsets) != len(self._labels) + 1:
+            counts = csr_to_counts(self._offsets, self._targets, self._cumulative)
+            for src, row in self._pending.items():
+                for dst, weight in row.items():
+                    key = (src << 32) | dst
+                    counts[key] = counts.get(key, 0) + weight
+
+            self._offsets, self._targets, self._cumulative = csr_from_counts(counts, len(self._labels))
+            self._pending = {}
+            self._pending_totals = {}
+            self._num_pending = 0
+
+        return self
+
+    def random_vertex(self, rng=random):
+        # a uniformly random starting point
+        vertex_id = rng.randrange(len(self._labels))
+        return CompactVertex(vertex_id, self._labels[vertex_id])
+
+    def _sample_stale(self, vertex_id, rng):
+        # one draw over the vertex's CSR slice and its overflow row together
+        finalized = 0
+        if vertex_id < len(self._offsets) - 1:
+            (lo, hi) = (self._offsets[vertex_id], self._offsets[vertex_id + 1])
+            if lo < hi:
+                finalized = self._cumulative[hi - 1]
+
+        value = rng.random() * (finalized + self._pending_totals[vertex_id])
+        if value < finalized:
+            return self._targets[bisect.bisect_right(self._cumulative, value, lo, hi - 1)]
+
+        value -= finalized
+        for (target, weight) in self._pending[vertex_id].items():
+            value -= weight
+            if value < 0:
+                return target
+        return target
+
+    def get_next_node(self, current_node:CompactVertex, rng=random):
+        if current_node.id in self._pending:
+            next_id = self._sample_stale(current_node.id, rng)
+        elif current_node.id >= len(self._offsets) - 1:
+            next_id = None # added since the last finalize, with no edges yet
+        else:
+            next_id = sample_row(self._offsets, self._targets, self._cumulative, current_node.id, rng)
+        if next_id is None:
+            # no edges left (end of the corpus, or pruned): restart the walk
+            return self.random_vertex(rng)
+
+        return CompactVertex(next_id, self._labels[next_id])
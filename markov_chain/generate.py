@@ -9,52 +9,206 @@ inspired by:
 additions / modifications:
     - debugging / length arguments to main()
     - no need to generate the edge/weight lists
+    - optional CompactGraph (interned labels, CSR edge arrays) for large corpora
+    - streaming, chunked tokenizer over any number of files / globs
+    - optional parallel (sharded) graph build, see parallel.py
+    - save / load (memory-mapped) binary models, see model.py
+    - order-k chains (the previous k words predict the next), see ngram.py
+    - many compositions at once, vectorized with NumPy, see batch.py
+    - fold new text into a saved model (--load MODEL --update FILE --save MODEL)
+    - pruning (--min-count, --top-k, --memory-budget), the report goes to stderr
 '''
+import argparse
+import glob
+import itertools
 import string
 import random
+import sys
 
-from graph import Graph, Vertex
+from graph import Graph, PruneReport, Vertex
+from compact import CompactGraph
+from ngram import NGramGraph
+import model
 
-def get_words(data_path):
+CHUNK_SIZE = 1 << 16
+STRIP_PUNCTUATION = str.maketrans('','',string.punctuation)
+PRUNE_BATCH = 100000
+
+def read_chunks(data_path,chunk_size=CHUNK_SIZE):
+    """Read a text file in fixed-size chunks
+
+    Args:
+        data_path (str): file to read
+        chunk_size (int, optional): characters per chunk. Defaults to CHUNK_SIZE.
+
+    Yields:
+        str: the next chunk of text
+    """
     with open(data_path,'r') as data_source:
-        data = data_source.read()
-        data = ' '.join(data.split())
-        data = data.lower()
-        data = data.translate(str.maketrans('','',string.punctuation))
+        chunk = data_source.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = data_source.read(chunk_size)
 
-    return data.split()
+def tokenize(chunks):
+    """Turn a stream of text chunks into a stream of words
 
+    A word that runs across the end of a chunk is held back and glued onto the
+    start of the next one, so chunk boundaries never split a word.
 
-def make_graph(labels):
-    graph = Graph()
-    prev_label = None
+    Args:
+        chunks (iterable): chunks of text
 
-    for label in labels:
-        node = graph.get_vertex(label)
+    Yields:
+        str: lowercase words with the punctuation removed
+    """
+    partial = ''
+    for chunk in chunks:
+        chunk = (partial + chunk).lower()
+        words = chunk.split()
+        partial = ''
+        if words and not chunk[-1].isspace():
+            partial = words.pop()
+
+        for word in words:
+            word = word.translate(STRIP_PUNCTUATION)
+            if word:
+                yield word
+
+    partial = partial.translate(STRIP_PUNCTUATION)
+    if partial:
+        yield partial
+
+def expand_paths(patterns):
+    """Expand file names and globs into a list of files
+
+    Args:
+        patterns (list): file names and/or glob patterns
+
+    Returns:
+        list: matching files, in the order given (globs are sorted)
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if matches:
+            paths.extend(matches)
+        else:
+            # keep it, so a missing file is reported when it's opened
+            paths.append(pattern)
+
+    return paths
+
+def iter_words(patterns,chunk_size=CHUNK_SIZE):
+    """Stream the words of one or more files
+
+    Args:
+        patterns (list): file names and/or glob patterns
+        chunk_size (int, optional): characters per read. Defaults to CHUNK_SIZE.
+
+    Yields:
+        str: the words of every file, in order
+    """
+    for data_path in expand_paths(patterns):
+        yield from tokenize(read_chunks(data_path,chunk_size))
+
+def get_words(data_path):
+    return list(iter_words([data_path]))
+
+
+def make_graph(labels,graph=None,order=1,memory_budget=None,reports=None):
+    if graph is None:
+        graph = Graph() if order == 1 else NGramGraph(order)
+
+    if memory_budget is not None and isinstance(graph,Graph):
+        # keep the graph inside the budget while it's being built
+        labels = iter(labels)
+        batch = list(itertools.islice(labels,PRUNE_BATCH))
+        while batch:
+            graph.update(batch)
+            report = graph.prune(memory_budget=memory_budget)
+            if reports is not None:
+                reports.append(report)
+            batch = list(itertools.islice(labels,PRUNE_BATCH))
+
+    graph.update(labels)
+    if isinstance(graph,(CompactGraph,NGramGraph)):
+        graph.finalize()
 
-        if prev_label:
-            graph.connect_to(prev_label,node)
-        
-        prev_label = label
-    
     return graph
 
-def compose(graph,words,length=100):
+def compose(graph,words=None,length=100,rng=random):
     composition = []
-    word = graph.get_vertex(random.choice(words))
+    if words:
+        word = graph.get_vertex(rng.choice(words))
+    else:
+        word = graph.random_vertex(rng)
     for _ in range(length):
         composition.append(word.label)
-        word = graph.get_next_node(word)
+        word = graph.get_next_node(word,rng)
     
     return composition
 
-def main(length=100,debug=False):
-    data = get_words('../LICENSE')
-    graph = make_graph(data)
-    composition = compose(graph,data,length)
+def main(length=100,debug=False,compact=False,paths=None,workers=1,load_path=None,save_path=None,order=1,count=1,update=False,
+         min_count=None,top_k=None,memory_budget=None):
+    if not paths:
+        paths = ['../LICENSE']
+    graph = CompactGraph() if compact else None
+    reports = []
+    if order > 1:
+        # higher-order graphs are always compact, and built serially
+        graph = make_graph(iter_words(paths),order=order)
+    elif load_path:
+        graph = model.load(load_path)
+        if update:
+            graph.update(iter_words(paths))
+    elif workers > 1:
+        from parallel import make_graph_parallel
+        graph = make_graph_parallel(paths,workers,graph)
+    else:
+        graph = make_graph(iter_words(paths),graph,memory_budget=memory_budget,reports=reports)
+
+    if isinstance(graph,Graph) and (min_count or top_k is not None or memory_budget is not None):
+        # include what the build already pruned, or the report only sees the last step
+        reports.append(graph.prune(min_count,top_k,memory_budget))
+        print(PruneReport.combine(reports),file=sys.stderr)
+
+    if save_path:
+        model.save(graph,save_path)
+    if count > 1 and not isinstance(graph,NGramGraph):
+        from batch import compose_batch
+        compositions = compose_batch(graph,count,length)
+    else:
+        compositions = [compose(graph,length=length) for _ in range(count)]
     if debug:
         print(graph)
-    return ' '.join(composition)
+    return '\n'.join(' '.join(composition) for composition in compositions)
 
 if __name__ == '__main__':
-    print(main(length=25))
+    parser = argparse.ArgumentParser(description="Compose text from a Markov chain built over a corpus.")
+    parser.add_argument("paths",nargs="*",metavar="FILE",help="Corpus files or globs (default: ../LICENSE)")
+    parser.add_argument("--length","-l",action="store",type=int,default=25,help="Number of words to compose")
+    parser.add_argument("--count","-n",action="store",type=int,default=1,help="Number of compositions (more than 1 are composed in one NumPy batch)")
+    parser.add_argument("--compact","-c",action="store_true",default=False,help="Use the interned, array-backed CompactGraph")
+    parser.add_argument("--order","-k",action="store",type=int,default=1,help="Number of previous words that predict the next one")
+    parser.add_argument("--workers","-w",action="store",type=int,default=1,help="Build the graph with this many processes")
+    parser.add_argument("--load",action="store",metavar="MODEL",help="Memory-map a saved model instead of reading a corpus")
+    parser.add_argument("--update",action="store_true",default=False,help="Fold the FILEs into the --load model (use with --save to keep it)")
+    parser.add_argument("--save",action="store",metavar="MODEL",help="Save the graph as a binary model")
+    parser.add_argument("--min-count",action="store",type=int,help="Prune edges seen fewer times than this")
+    parser.add_argument("--top-k",action="store",type=int,help="Prune all but the k heaviest edges of each word")
+    parser.add_argument("--memory-budget",action="store",type=int,metavar="BYTES",help="Evict the lightest edges to keep the graph under this size")
+    parser.add_argument("--debug",action="store_true",default=False,help="Print the graph")
+    args = parser.parse_args()
+    if args.update and not args.load:
+        parser.error("--update needs --load")
+    if (args.min_count or args.top_k is not None or args.memory_budget is not None) and (args.compact or args.order > 1 or args.load):
+        parser.error("pruning works on the default graph, not with --compact, --order or --load")
+    if args.order < 1:
+        parser.error("--order must be at least 1")
+    if args.order > 1 and (args.workers > 1 or args.load or args.save):
+        parser.error("--order above 1 can't be combined with --workers, --load or --save")
+
+    print(main(length=args.length,debug=args.debug,compact=args.compact,paths=args.paths,workers=args.workers,
+               load_path=args.load,save_path=args.save,order=args.order,count=args.count,update=args.update,
+               min_count=args.min_count,top_k=args.top_k,memory_budget=args.memory_budget))
@@ -18,10 +18,17 @@ additions / modifications:
         edges that connect it to other vertices, but the _graph_ does the connecting
     - adding an edge automatically incremenets (instead of the other way around)
     - allow adding an edge to include an optional weight (instead of always 1)
+    - cached cumulative weights (built lazily, reset by add_edge) so next_node is a bisect
+    - update() folds new text into an existing graph
+    - prune() (min count, top-k per vertex, memory budget) with a size report
+    - a vertex with no edges restarts the walk at a random vertex instead of failing
 
 """
 
+import bisect
+import math
 import random
+import sys
 
 class Vertex(object):
     """Vertex Class
@@ -29,6 +36,8 @@ class Vertex(object):
     Properties:
         _label: The label for the Vertex.
         _edges: The dictionary of connecting edges and weights
+        _targets: Cached list of connected vertices (None until the next draw)
+        _cumulative: Cached running totals of the weights, parallel to _targets
     """
     def __init__(self, label):
         """Initialize the object
@@ -38,6 +47,8 @@ class Vertex(object):
         """
         self._label = label
         self._edges = {}
+        self._targets = None
+        self._cumulative = None
 
     @property
     def label(self):
@@ -67,22 +78,95 @@ class Vertex(object):
             weight (int, optional): The weight(preference) of the connection. Defaults to 1.
         """
         self._edges[vertex] = self._edges.get(vertex,0) + weight
+        # the sampler is stale now, rebuild it on the next draw
+        self._cumulative = None
 
-    def next_node(self):
+    def _build_sampler(self):
+        """Build the cumulative weight table used by next_node
+        """
+        self._targets = list(self._edges.keys())
+        self._cumulative = []
+        total = 0
+        for weight in self._edges.values():
+            total += weight
+            self._cumulative.append(total)
+
+    def keep_edges(self, edges):
+        """Replace the edges (used when pruning)
+
+        Args:
+            edges (dict): the connected vertices and weights to keep
+        """
+        # a new dict, deleting from the old one would never give the memory back
+        self._edges = dict(edges)
+        self._cumulative = None
+
+    def next_node(self, rng=random):
         """Get a random connected node
 
+        Args:
+            rng (random.Random, optional): source of randomness. Defaults to the random module.
+
         Returns:
-            vertex: random, weighted, vertex from the connected vertices
+            vertex: random, weighted, vertex from the connected vertices (None if there are none)
         """
-        return random.choices(self.edges,weights=self.weights)[0]
+        if not self._edges:
+            return None
+
+        if self._cumulative is None:
+            self._build_sampler()
+
+        # same draw random.choices(cum_weights=...) makes, without the per-call lists
+        cumulative = self._cumulative
+        return self._targets[bisect.bisect_right(cumulative, rng.random() * cumulative[-1], 0, len(cumulative) - 1)]
+
+class PruneReport:
+    """How much a Graph.prune() call shrank the graph
+
+    Properties:
+        before / after: (vertices, edges, total weight, estimated bytes)
+    """
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+
+    def __str__(self):
+        report = ''
+        for (index, name) in enumerate(['vertices', 'edges', 'weight', 'bytes']):
+            (old, new) = (self.before[index], self.after[index])
+            shrunk = 100 * (old - new) / old if old else 0
+            report += f'{name:>8}: {old:>12,} -> {new:>12,} ({shrunk:.1f}% smaller)\n'
+
+        return report
+
+    @classmethod
+    def combine(cls, reports):
+        """One report for several prune() calls on a graph that kept growing in between
+
+        "before" is the final size plus everything the calls removed. Weight is
+        exact; an edge evicted and then seen again counts twice.
+
+        Args:
+            reports (list): PruneReports, oldest first
+
+        Returns:
+            PruneReport: the combined report
+        """
+        after = reports[-1].after
+        before = tuple(after[index] + sum(report.before[index] - report.after[index] for report in reports)
+                       for index in range(len(after)))
+        return cls(before, after)
 
 class Graph:
     """Graph object
 
     Properties:
+        _vertices: label -> Vertex
+        _last: label of the last word folded in by update()
     """
     def __init__(self):
         self._vertices = {}
+        self._last = None
     
     def __repr__(self):
         graph = ''
@@ -91,13 +175,24 @@ class Graph:
 
         return graph
 
+    def __iter__(self):
+        return iter(self._vertices.values())
+
+    @property
+    def last(self):
+        return self._last
+
+    @last.setter
+    def last(self,label):
+        self._last = label
+
     @property
     def vertices(self):
         return set(self._vertices.keys())
 
     @vertices.setter
     def vertices(self,vertex):
-        if vertex not in self.vertices:
+        if vertex not in self._vertices:
             self._vertices[vertex] = Vertex(vertex)
     
     def add_vertex(self,label):
@@ -106,14 +201,133 @@ class Graph:
     
     def get_vertex(self,label):
         # if a vertex we're looking for isn't in the graph, add it
-        if label not in self.vertices:
+        # (check the dict directly, the vertices property copies every label)
+        if label not in self._vertices:
             self.add_vertex(label)
         
         # return the vertex object
         return self._vertices[label]
     
-    def get_next_node(self, current_node:Vertex):
-        return self._vertices[current_node.label].next_node()
+    def random_vertex(self, rng=random):
+        # a uniformly random starting point
+        return rng.choice(list(self._vertices.values()))
+
+    def get_next_node(self, current_node:Vertex, rng=random):
+        # a vertex with no edges left (end of the corpus, or pruned) restarts the walk
+        next_node = self._vertices[current_node.label].next_node(rng)
+        if next_node is None:
+            next_node = self.random_vertex(rng)
+
+        return next_node
     
     def connect_to(self,vertex1,vertex2,weight=1):
         self.get_vertex(vertex1).add_edge(vertex2,weight)
+
+    def update(self,labels):
+        """Fold more words into the graph
+
+        The last word is carried over, so calling update() on consecutive
+        batches builds the same graph as one call on the whole text. Only
+        the vertices that gain an edge drop their sampling cache.
+
+        Args:
+            labels (iterable): the words, in order
+        """
+        prev_label = self._last
+        for label in labels:
+            node = self.get_vertex(label)
+            if prev_label is not None:
+                self.connect_to(prev_label,node)
+            prev_label = label
+
+        self._last = prev_label
+
+    def stats(self):
+        """Size of the graph
+
+        The byte count is an estimate from sys.getsizeof: the vertex objects,
+        their labels and edge dicts, the weights and the graph's own dict.
+
+        Returns:
+            tuple: vertices, edges, total weight, estimated bytes
+        """
+        edges = 0
+        weight = 0
+        size = sys.getsizeof(self._vertices)
+        for vertex in self._vertices.values():
+            edges += len(vertex._edges)
+            size += sys.getsizeof(vertex) + sys.getsizeof(vertex.__dict__) + sys.getsizeof(vertex.label)
+            size += sys.getsizeof(vertex._edges)
+            for count in vertex._edges.values():
+                weight += count
+                size += sys.getsizeof(count)
+
+        return len(self._vertices), edges, weight, size
+
+    def _base_bytes(self):
+        # estimated bytes of the graph if every vertex had an empty edge dict
+        empty = sys.getsizeof({})
+        return sys.getsizeof(self._vertices) + sum(sys.getsizeof(vertex) + sys.getsizeof(vertex.__dict__)
+                                                   + sys.getsizeof(vertex.label) + empty
+                                                   for vertex in self._vertices.values())
+
+    def _drop_isolated(self):
+        # vertices nothing points to and that point nowhere are dead weight
+        targets = {target.label for vertex in self._vertices.values() for target in vertex._edges}
+        self._vertices = {label: vertex for (label, vertex) in self._vertices.items()
+                          if vertex._edges or label in targets or label == self._last}
+
+    def _evict(self, memory_budget):
+        """Drop the lowest-weight edges (graph wide) until the estimate fits the budget
+        """
+        (_, edges, _, size) = self.stats()
+        while size > memory_budget and edges:
+            # bytes that go away with each edge, roughly. Dropping edges also
+            # frees the vertices they leave isolated, so only take half the
+            # estimate (but at least 1% of the edges) per round
+            edge_bytes = max(1, (size - self._base_bytes()) / edges)
+            drop = min(edges, max(math.ceil((size - memory_budget) / edge_bytes / 2), edges // 100, 1))
+
+            ranked = sorted(((weight, vertex, target) for vertex in self._vertices.values()
+                             for (target, weight) in vertex._edges.items()), key=lambda edge: edge[0])
+            evicted = {}
+            for (_, vertex, target) in ranked[:drop]:
+                evicted.setdefault(vertex, set()).add(target)
+            for (vertex, targets) in evicted.items():
+                vertex.keep_edges((target, weight) for (target, weight) in vertex._edges.items() if target not in targets)
+
+            self._drop_isolated()
+            (_, edges, _, size) = self.stats()
+
+    def prune(self, min_count=None, top_k=None, memory_budget=None):
+        """Shrink the graph
+
+        Generation keeps working afterwards: a vertex that loses every edge
+        restarts the walk at a random vertex (see get_next_node).
+
+        Args:
+            min_count (int, optional): drop edges seen fewer times than this
+            top_k (int, optional): keep only the k heaviest edges of each vertex
+            memory_budget (int, optional): evict the lowest-weight edges, graph wide,
+                                           until the estimated size (see stats) fits
+
+        Returns:
+            PruneReport: the size before and after
+        """
+        before = self.stats()
+        for vertex in self._vertices.values():
+            edges = vertex._edges.items()
+            if min_count:
+                edges = [(target, weight) for (target, weight) in edges if weight >= min_count]
+            if top_k is not None and len(edges) > top_k:
+                # sorted() is stable, so ties keep the order they were first seen in
+                kept = {target for (target, _) in sorted(edges, key=lambda edge: edge[1], reverse=True)[:top_k]}
+                edges = [(target, weight) for (target, weight) in edges if target in kept]
+            if len(edges) != len(vertex._edges):
+                vertex.keep_edges(edges)
+
+        if memory_budget is not None:
+            self._evict(memory_budget)
+
+        self._drop_isolated()
+        return PruneReport(before, self.stats())
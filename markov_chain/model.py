@@ -0,0 +1,123 @@
+'''Save / load a Markov chain graph as a binary, memory-mappable model
+
+skills:
+    - struct / binary file formats
+    - mmap + memoryview (zero-copy arrays)
+
+additions / modifications:
+    - build the graph once, then load it in any number of processes; the
+      arrays are read straight out of the page cache and shared between them
+    - labels are decoded lazily, only the ones that get used are ever built
+
+file layout (little-endian, every section 8-byte aligned up to the targets):
+    header          magic, version, vertex count, edge count, label bytes,
+                    last word id (version 2+, all ones if there is none)
+    offsets         uint64 * (vertices + 1)   edge slice of each vertex
+    label_offsets   uint64 * (vertices + 1)   byte slice of each label
+    cumulative      uint64 * edges            running weight totals
+    targets         uint32 * edges            target vertex ids
+    labels          utf-8 bytes               every label, back to back
+'''
+import mmap
+import struct
+import sys
+from array import array
+
+from compact import CompactGraph
+
+MAGIC = b'MKVG'
+VERSION = 2
+PREAMBLE = struct.Struct('<4sI')
+HEADERS = {
+    1: struct.Struct('<4sIQQQ'),
+    2: struct.Struct('<4sIQQQQ'),
+}
+NO_WORD = (1 << 64) - 1
+
+class LabelTable:
+    """Read-only sequence of labels backed by the model file
+
+    Properties:
+        _offsets: byte offset of each label in _blob
+        _blob: the utf-8 label bytes
+    """
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, vertex_id):
+        if not 0 <= vertex_id < len(self):
+            raise IndexError(vertex_id)
+        return str(self._blob[self._offsets[vertex_id]:self._offsets[vertex_id + 1]], 'utf-8')
+
+    def __iter__(self):
+        for vertex_id in range(len(self)):
+            yield self[vertex_id]
+
+def _check_byteorder():
+    if sys.byteorder != 'little':
+        raise ValueError('the model format is little-endian only')
+
+def save(graph, model_path):
+    """Write a graph to a model file
+
+    Args:
+        graph (Graph | CompactGraph): the graph to save
+        model_path (str): file to write
+    """
+    _check_byteorder()
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_graph(graph)
+    (offsets, targets, cumulative) = graph.csr
+
+    label_offsets = array('Q', [0])
+    blob = bytearray()
+    for label in graph.labels:
+        blob += label.encode('utf-8')
+        label_offsets.append(len(blob))
+
+    last = NO_WORD if graph.last_id is None else graph.last_id
+    with open(model_path, 'wb') as model:
+        model.write(HEADERS[VERSION].pack(MAGIC, VERSION, len(graph), len(targets), len(blob), last))
+        for section in (offsets, label_offsets, cumulative, targets):
+            model.write(memoryview(section).cast('B'))
+        model.write(blob)
+
+def load(model_path):
+    """Memory-map a model file
+
+    Args:
+        model_path (str): file written by save()
+
+    Raises:
+        ValueError: not a model file, or an unsupported version
+
+    Returns:
+        CompactGraph: graph whose arrays live in the mapped file
+    """
+    _check_byteorder()
+    with open(model_path, 'rb') as model:
+        mapped = mmap.mmap(model.fileno(), 0, access=mmap.ACCESS_READ)
+
+    (magic, version) = PREAMBLE.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f'{model_path} is not a Markov chain model')
+    if version not in HEADERS:
+        raise ValueError(f'{model_path} is model version {version}, expected at most {VERSION}')
+
+    (_, _, num_vertices, num_edges, label_bytes, *last) = HEADERS[version].unpack_from(mapped, 0)
+    view = memoryview(mapped)
+    position = HEADERS[version].size
+    sections = []
+    for (code, count) in (('Q', num_vertices + 1), ('Q', num_vertices + 1), ('Q', num_edges), ('I', num_edges)):
+        size = count * array(code).itemsize
+        sections.append(view[position:position + size].cast(code))
+        position += size
+
+    (offsets, label_offsets, cumulative, targets) = sections
+    labels = LabelTable(label_offsets, view[position:position + label_bytes])
+    last_id = last[0] if last and last[0] != NO_WORD else None
+    return CompactGraph.from_arrays(labels, offsets, targets, cumulative, last_id)
@@ -0,0 +1,211 @@
+"""Higher-order (order-k) Markov chain graph
+
+The state is the previous k words instead of just the previous word.
+
+skills:
+    - tries
+    - sliding windows (collections.deque)
+
+additions / modifications:
+    - k-word contexts are interned into integer state ids through a trie kept
+      in one flat dict: {(parent node << 32) | word id: child node}
+      so no tuple of strings is ever stored per state
+    - a transition goes straight from one state id to the next state id, so
+      sampling is the same CSR draw the CompactGraph does
+    - same random_vertex / get_next_node surface as the other graphs, a state's
+      label is the last word of its context
+
+"""
+
+import random
+from array import array
+from collections import deque, namedtuple
+
+from compact import csr_from_counts, csr_to_counts, sample_row
+
+NGramState = namedtuple('NGramState', ['id', 'label'])
+
+class NGramGraph:
+    """Order-k graph object
+
+    Properties:
+        _order: number of words in a state
+        _ids, _labels: word interning (word -> id, id -> word)
+        _trie: {(parent << 32) | word id: node}, leaves (depth k) are state ids
+        _nodes: number of inner trie nodes (the root is node 0)
+        _state_parent: depth k-1 trie node of each state
+        _state_word: last word id of each state
+        _parents, _words: the same for the inner trie nodes
+        _window: the last k word ids seen by update()
+        _state: state id of _window, once it is full
+        _pending: transition counts that have not been finalized yet
+        _offsets, _targets, _cumulative: the finalized CSR arrays
+    """
+    def __init__(self, order=2):
+        if order < 1:
+            raise ValueError('order must be at least 1')
+
+        self._order = order
+        self._ids = {}
+        self._labels = []
+        self._trie = {}
+        self._nodes = 1
+        self._parents = array('I', [0])
+        self._words = array('I', [0])
+        self._state_parent = array('I')
+        self._state_word = array('I')
+        self._window = deque(maxlen=order)
+        self._state = None
+        self._pending = {}
+        self._offsets, self._targets, self._cumulative = csr_from_counts({}, 0)
+
+    def __repr__(self):
+        self.finalize()
+        graph = ''
+        for state in range(len(self)):
+            graph += ' '.join(self.context(state)) + ' -> [\n'
+            previous = 0
+            for edge in range(self._offsets[state], self._offsets[state + 1]):
+                target = self._targets[edge]
+                graph += f'\t( {self._labels[self._state_word[target]]} = {self._cumulative[edge] - previous} )\n'
+                previous = self._cumulative[edge]
+            graph += ']\n'
+
+        return graph
+
+    def __len__(self):
+        return len(self._state_word)
+
+    @property
+    def order(self):
+        return self._order
+
+    @property
+    def num_edges(self):
+        self.finalize()
+        return len(self._targets)
+
+    def _intern(self, label):
+        word_id = self._ids.get(label)
+        if word_id is None:
+            word_id = len(self._labels)
+            self._ids[label] = word_id
+            self._labels.append(label)
+
+        return word_id
+
+    def _intern_state(self, word_ids):
+        """Walk (and grow) the trie for k word ids
+
+        Args:
+            word_ids (iterable): exactly `order` word ids
+
+        Returns:
+            int: the state id
+        """
+        node = 0
+        depth = 1
+        for word_id in word_ids:
+            key = (node << 32) | word_id
+            child = self._trie.get(key)
+            if child is None:
+                if depth < self._order:
+                    child = self._nodes
+                    self._nodes += 1
+                    self._parents.append(node)
+                    self._words.append(word_id)
+                else:
+                    child = len(self._state_word)
+                    self._state_parent.append(node)
+                    self._state_word.append(word_id)
+                self._trie[key] = child
+            node = child
+            depth += 1
+
+        return node
+
+    def context(self, state):
+        """The words of a state
+
+        Args:
+            state (int): state id
+
+        Returns:
+            tuple: the k words, oldest first
+        """
+        words = [self._state_word[state]]
+        node = self._state_parent[state]
+        while node:
+            words.append(self._words[node])
+            node = self._parents[node]
+
+        return tuple(self._labels[word_id] for word_id in reversed(words))
+
+    def get_vertex(self, labels):
+        if len(labels) != self._order:
+            raise ValueError(f'a state needs {self._order} words')
+
+        state = self._intern_state(self._intern(label) for label in labels)
+        return NGramState(state, labels[-1])
+
+    def connect_to(self, labels, label, weight=1):
+        # the context `labels` followed by `label`
+        src = self.get_vertex(labels).id
+        dst = self.get_vertex(tuple(labels[1:]) + (label,)).id
+        key = (src << 32) | dst
+        self._pending[key] = self._pending.get(key, 0) + weight
+
+    def update(self, labels):
+        """Fold more words into the graph
+
+        The last k words are carried over, so calling update() on consecutive
+        batches builds the same graph as one call on the whole text.
+
+        Args:
+            labels (iterable): the words, in order
+        """
+        window = self._window
+        pending = self._pending
+        prev_state = self._state
+        for label in labels:
+            window.append(self._intern(label))
+            if len(window) < self._order:
+                continue
+
+            state = self._intern_state(window)
+            if prev_state is not None:
+                key = (prev_state << 32) | state
+                pending[key] = pending.get(key, 0) + 1
+            prev_state = state
+
+        self._state = prev_state
+
+    def finalize(self):
+        """Fold the counting phase into the CSR arrays
+
+        Returns:
+            NGramGraph: self, so calls can be chained
+        """
+        if self._pending or len(self._offsets) != len(self) + 1:
+            counts = csr_to_counts(self._offsets, self._targets, self._cumulative)
+            for key, weight in self._pending.items():
+                counts[key] = counts.get(key, 0) + weight
+
+            self._offsets, self._targets, self._cumulative = csr_from_counts(counts, len(self))
+            self._pending = {}
+
+        return self
+
+    def random_vertex(self, rng=random):
+        # a uniformly random starting state
+        state = rng.randrange(len(self))
+        return NGramState(state, self._labels[self._state_word[state]])
+
+    def get_next_node(self, current_node:NGramState, rng=random):
+        self.finalize()
+        state = sample_row(self._offsets, self._targets, self._cumulative, current_node.id, rng)
+        if state is None:
+            # no edges left (end of the corpus, or pruned): restart the walk
+            return self.random_vertex(rng)
+
+        return NGramState(state, self._labels[self._state_word[state]])
@@ -0,0 +1,249 @@
+'''Serve Markov chain compositions from a warm model
+
+skills:
+    - asyncio streams (a tiny HTTP/1.0 server)
+    - request batching and backpressure with asyncio.Queue
+    - latency percentiles
+
+additions / modifications:
+    - the graph is built (or memory-mapped) once, then every request reuses it
+    - GET /compose?length=25&seed=7&count=3 returns JSON compositions
+    - GET /stats returns request counts and p50 / p99 latency
+    - requests wait in a bounded queue; a single batcher drains whatever is
+      queued (up to --batch requests) and composes them together in a worker
+      thread, so the event loop keeps accepting connections
+    - a full queue answers 503 straight away instead of piling up work
+    - --bench runs a load generator against the server and reports latency
+
+usage:
+    python server.py ../LICENSE --port 8080
+    python server.py --load model.mkv --bench 2000 --concurrency 64
+'''
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from compact import CompactGraph
+from generate import compose, iter_words, make_graph
+import model
+
+MAX_LENGTH = 10000
+MAX_COUNT = 1000
+LATENCY_SAMPLES = 10000
+
+def percentile(samples, pct):
+    """Nearest-rank percentile
+
+    Args:
+        samples (list): the values
+        pct (float): percentile, 0-100
+
+    Returns:
+        float: the percentile (0 if there are no samples)
+    """
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def _int_param(query, name, default, low, high):
+    values = query.get(name)
+    if not values:
+        return default
+
+    value = int(values[0])
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return value
+
+class ComposeServer:
+    """Composition server
+
+    Properties:
+        _graph: the warm graph
+        _queue: requests waiting for the batcher (bounded, for backpressure)
+        _max_batch: most requests composed together
+        _latencies: recent request latencies, in seconds
+        _served / _rejected: request counters
+        _batcher_task: the running batcher
+    """
+    def __init__(self, graph, max_batch=64, queue_size=1024):
+        self._graph = graph
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._max_batch = max_batch
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._served = 0
+        self._rejected = 0
+        self._batcher_task = None
+
+    def _compose_batch(self, jobs):
+        # runs in a worker thread, one batch at a time
+        results = []
+        for (length, seed, count) in jobs:
+            rng = random.Random(seed)
+            results.append([' '.join(compose(self._graph, length=length, rng=rng)) for _ in range(count)])
+
+        return results
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                results = await loop.run_in_executor(None, self._compose_batch, [job for (job, _) in batch])
+                for ((_, future), result) in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as error:
+                for (_, future) in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def stats(self):
+        latencies = list(self._latencies)
+        return {
+            'served': self._served,
+            'rejected': self._rejected,
+            'queued': self._queue.qsize(),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        }
+
+    async def _respond(self, writer, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        writer.write(f'HTTP/1.0 {status}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode('ascii') + payload)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        started = time.perf_counter()
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass # skip the headers
+
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                await self._respond(writer, '405 Method Not Allowed', {'error': 'only GET is supported'})
+                return
+
+            url = urlsplit(request_line[1])
+            if url.path == '/stats':
+                await self._respond(writer, '200 OK', self.stats())
+                return
+            if url.path != '/compose':
+                await self._respond(writer, '404 Not Found', {'error': f'no such path {url.path}'})
+                return
+
+            query = parse_qs(url.query)
+            try:
+                job = (_int_param(query, 'length', 25, 0, MAX_LENGTH),
+                       _int_param(query, 'seed', None, -2**63, 2**63 - 1),
+                       _int_param(query, 'count', 1, 1, MAX_COUNT))
+            except ValueError as error:
+                await self._respond(writer, '400 Bad Request', {'error': str(error)})
+                return
+
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self._queue.put_nowait((job, future))
+            except asyncio.QueueFull:
+                self._rejected += 1
+                await self._respond(writer, '503 Service Unavailable', {'error': 'too many requests queued'})
+                return
+
+            compositions = await future
+            self._served += 1
+            self._latencies.append(time.perf_counter() - started)
+            await self._respond(writer, '200 OK', {'compositions': compositions})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start listening (and batching)
+
+        Returns:
+            asyncio.Server: the listening server
+        """
+        self._batcher_task = asyncio.get_running_loop().create_task(self._batcher())
+        return await asyncio.start_server(self.handle, host, port)
+
+async def _fetch(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode('ascii'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b' ', 2)[1].decode('ascii')
+
+async def run_load(host, port, requests, concurrency, length=25):
+    """Load generator: fire `requests` requests, `concurrency` at a time
+
+    Returns:
+        dict: status counts, throughput and p50 / p99 latency (ms)
+    """
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def client():
+        for number in remaining:
+            started = time.perf_counter()
+            status = await _fetch(host, port, f'/compose?length={length}&seed={number}')
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'statuses': statuses,
+        'requests_per_second': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+async def main(args):
+    if args.load:
+        graph = model.load(args.load)
+    else:
+        graph = make_graph(iter_words(args.paths or ['../LICENSE']), CompactGraph())
+
+    compose_server = ComposeServer(graph, args.batch, args.queue)
+    server = await compose_server.start(args.host, args.port)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        if args.bench:
+            print(json.dumps({'client': await run_load(args.host, port, args.bench, args.concurrency, args.length),
+                              'server': compose_server.stats()}, indent=2))
+        else:
+            print(f'serving compositions on http://{args.host}:{port}/compose')
+            await server.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve Markov chain compositions over HTTP on loopback.")
+    parser.add_argument("paths",nargs="*",metavar="FILE",help="Corpus files or globs (default: ../LICENSE)")
+    parser.add_argument("--load",action="store",metavar="MODEL",help="Memory-map a saved model instead of reading a corpus")
+    parser.add_argument("--host",action="store",default="127.0.0.1",help="Address to listen on")
+    parser.add_argument("--port","-p",action="store",type=int,default=8080,help="Port to listen on (0 picks a free one)")
+    parser.add_argument("--batch",action="store",type=int,default=64,help="Most requests composed together")
+    parser.add_argument("--queue",action="store",type=int,default=1024,help="Most requests waiting before answering 503")
+    parser.add_argument("--bench",action="store",type=int,default=0,metavar="REQUESTS",help="Run a load generator and report latency")
+    parser.add_argument("--concurrency","-c",action="store",type=int,default=32,help="Concurrent clients for --bench")
+    parser.add_argument("--length","-l",action="store",type=int,default=25,help="Words per composition for --bench")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,252 @@
+'''Solve a file of Sudoku puzzles with a pool of worker processes
+
+Skills:
+    - generators (streaming input)
+    - multiprocessing (apply_async + an ordered window of results)
+
+Add-ons
+    - one puzzle per line, either one character per space ('.' or '0' for an
+      empty space) or the delimited format --board takes (any box size)
+    - puzzles are read, solved and written a chunk at a time, and only a few
+      chunks are in flight at once, so memory stays flat for any file size
+    - solutions come out in input order, in the same format as the input
+    - reports puzzles/second when it's done
+    - the vector engine solves each chunk as one NumPy batch (see vector.py)
+    - with a solution limit (--count / --unique) each line gets the number of
+      solutions instead, capped at the limit
+    - with a cache (--cache) every worker looks puzzles up by canonical form
+      first and only solves the ones it hasn't seen in any orientation
+    - a line that isn't a puzzle gets INVALID and the run carries on, and
+      givens that clash (the same digit twice in a unit) are UNSOLVABLE
+      without ever reaching an engine (plain backtracking would never finish)
+'''
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from propagate import build_units, count_solutions
+from sudoku import Board, ENGINES
+
+UNSOLVABLE = 'UNSOLVABLE'
+INVALID = 'INVALID'
+
+def parse_puzzle(line: str, delimiter: str = ",", box_size: int = 3) -> list:
+    """Turn one line of input into a list of values
+
+    Args:
+        line (str): the puzzle
+        delimiter (str, optional): delimiter of the long format. Defaults to ",".
+        box_size (int, optional): width of a box. Defaults to 3.
+
+    Raises:
+        ValueError: a space that isn't empty or a digit from 1 to size
+
+    Returns:
+        list: size * size values, -1 for an empty space
+    """
+    size = box_size * box_size
+    spaces = box_size ** 4
+    if delimiter in line:
+        fields = line.split(delimiter)
+    else:
+        fields = list(line)
+
+    values = []
+    for field in fields[:spaces]:
+        field = field.strip()
+        value = int(field) if field not in ('', '.', '0') else -1
+        if value != -1 and not 1 <= value <= size:
+            raise ValueError(f'{value} is not a digit from 1 to {size}')
+        values.append(value)
+
+    return values + [-1] * (spaces - len(values))
+
+def givens_clash(values: list, box_size: int = 3) -> bool:
+    """Does a digit appear twice in a row, column or box?
+
+    Args:
+        values (list): every space, row by row (-1 for an empty space)
+        box_size (int, optional): width of a box. Defaults to 3.
+
+    Returns:
+        bool: True if the givens clash (the puzzle has no solution)
+    """
+    for unit in build_units(box_size)[0]:
+        digits = [values[space] for space in unit if values[space] != -1]
+        if len(digits) != len(set(digits)):
+            return True
+    return False
+
+def read_puzzle(line: str, delimiter: str = ",", box_size: int = 3) -> tuple:
+    """Parse and check one line
+
+    Returns:
+        tuple: the values (None if the line can't be solved) and the output line
+               for a puzzle that can't be (None if it can)
+    """
+    try:
+        values = parse_puzzle(line, delimiter, box_size)
+    except ValueError:
+        return None, INVALID
+    if givens_clash(values, box_size):
+        return None, UNSOLVABLE
+    return values, None
+
+def format_solution(values: list, line: str, delimiter: str = ",") -> str:
+    # answer in the same format the puzzle came in
+    if delimiter in line:
+        return delimiter.join(str(value) for value in values)
+    return ''.join(str(value) for value in values)
+
+def solve_lines(lines: list, engine: str = "propagate", delimiter: str = ",", box_size: int = 3,
+                limit: int = None) -> list:
+    """Solve a chunk of puzzles (runs in a worker)
+
+    Args:
+        lines (list): puzzles, one per line
+        engine (str, optional): key of sudoku.ENGINES. Defaults to "propagate".
+        delimiter (str, optional): delimiter of the long format. Defaults to ",".
+        box_size (int, optional): width of a box. Defaults to 3.
+        limit (int, optional): count solutions up to this many instead of solving. Defaults to None.
+
+    Returns:
+        list: one output line per puzzle
+    """
+    puzzles = [read_puzzle(line, delimiter, box_size) for line in lines]
+    if engine == 'vector' and limit is None:
+        from vector import VectorSolver
+
+        solutions = iter(VectorSolver(box_size).solve([values for (values, _) in puzzles if values is not None]))
+        results = []
+        for ((values, failed), line) in zip(puzzles, lines):
+            if failed:
+                results.append(failed)
+                continue
+            values = next(solutions)
+            results.append(UNSOLVABLE if values is None else format_solution(values, line, delimiter))
+        return results
+
+    solve = ENGINES[engine]
+    results = []
+    for ((values, failed), line) in zip(puzzles, lines):
+        if failed:
+            results.append('0' if limit is not None and failed == UNSOLVABLE else failed)
+            continue
+        board = Board(','.join('' if value == -1 else str(value) for value in values), box_size=box_size)
+        if limit is not None:
+            results.append(str(count_solutions(board, limit)))
+        elif solve(board):
+            results.append(format_solution(board.values(), line, delimiter))
+        else:
+            results.append(UNSOLVABLE)
+
+    return results
+
+def solve_lines_cached(lines: list, engine: str, delimiter: str, cache_path: str) -> tuple:
+    """Solve a chunk of 9x9 puzzles through a SolutionCache (runs in a worker)
+
+    Args:
+        lines (list): puzzles, one per line
+        engine (str): key of sudoku.ENGINES, for the puzzles the cache doesn't know
+        delimiter (str): delimiter of the long format
+        cache_path (str): sqlite file of the cache
+
+    Returns:
+        tuple: one output line per puzzle, number of cache hits
+    """
+    from cache import SolutionCache
+
+    solve = ENGINES[engine]
+
+    def solver(values):
+        board = Board(','.join('' if value == -1 else str(value) for value in values))
+        return board.values() if solve(board) else None
+
+    results = []
+    with SolutionCache(cache_path) as cache:
+        for line in lines:
+            (values, failed) = read_puzzle(line, delimiter)
+            if failed:
+                results.append(failed)
+                continue
+            values = cache.solve(values, solver)
+            results.append(UNSOLVABLE if values is None else format_solution(values, line, delimiter))
+
+    return results, cache.hits
+
+def read_chunks(source, chunk_size: int):
+    """Group the non-blank lines of a file into lists
+
+    Args:
+        source (file): open puzzle file
+        chunk_size (int): puzzles per chunk
+
+    Yields:
+        list: up to chunk_size puzzles
+    """
+    chunk = []
+    for line in source:
+        line = line.strip()
+        if line:
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+def solve_batch(source, output, engine: str = "propagate", delimiter: str = ",",
+                workers: int = None, chunk_size: int = 256, box_size: int = 3, limit: int = None,
+                cache_path: str = None) -> tuple:
+    """Solve every puzzle in a file
+
+    Args:
+        source (file): open puzzle file
+        output (file): where the solutions go, one line per puzzle
+        engine (str, optional): key of sudoku.ENGINES. Defaults to "propagate".
+        delimiter (str, optional): delimiter of the long format. Defaults to ",".
+        workers (int, optional): worker processes. Defaults to the CPU count.
+        chunk_size (int, optional): puzzles per task. Defaults to 256.
+        box_size (int, optional): width of a box. Defaults to 3.
+        limit (int, optional): count solutions up to this many instead of solving. Defaults to None.
+        cache_path (str, optional): sqlite SolutionCache to go through (9x9 only). Defaults to None.
+
+    Returns:
+        tuple: number of puzzles, seconds taken, cache hits
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    solved = 0
+    hits = 0
+
+    if cache_path:
+        (task, extra) = (solve_lines_cached, (engine, delimiter, cache_path))
+    else:
+        (task, extra) = (solve_lines, (engine, delimiter, box_size, limit))
+
+    def write(results):
+        nonlocal hits
+        if cache_path:
+            (results, chunk_hits) = results
+            hits += chunk_hits
+        output.write('\n'.join(results) + '\n')
+        return len(results)
+
+    if workers == 1:
+        for chunk in read_chunks(source, chunk_size):
+            solved += write(task(chunk, *extra))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            # a short queue of in-flight chunks keeps every worker busy without
+            # reading the whole file ahead (Pool.imap would)
+            in_flight = deque()
+            for chunk in read_chunks(source, chunk_size):
+                in_flight.append(pool.apply_async(task, (chunk,) + extra))
+                if len(in_flight) >= 2 * workers:
+                    solved += write(in_flight.popleft().get())
+            while in_flight:
+                solved += write(in_flight.popleft().get())
+
+    return solved, time.perf_counter() - started, hits
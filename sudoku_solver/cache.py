@@ -0,0 +1,244 @@
+'''Remember solved Sudoku puzzles up to symmetry
+
+Skills:
+    - symmetry groups (canonical forms)
+    - numpy vectorization
+    - sqlite3
+
+Add-ons
+    - two puzzles are the same if one turns into the other by relabeling the
+      digits, reordering the rows inside a band, the bands, the columns inside
+      a stack, the stacks, or transposing; that is 9! * 2 * 6^8 versions of
+      every puzzle
+    - the canonical form is the smallest of them all, reading row by row, with
+      empty spaces as 0 and the digits relabeled 1, 2, 3, ... in the order they
+      first appear
+    - it is built a row at a time: every (transpose, column order) is tried
+      for the first row at once in numpy, only the ties for the smallest row
+      survive, and those are extended with the rows that are allowed next
+    - a filled space is always bigger than an empty one, so candidates are
+      first cut down by where their filled spaces land (a table lookup) and
+      only the survivors are relabeled
+    - solutions are stored in canonical form in sqlite, so any version of a
+      puzzle that has been solved before maps straight back without a solve
+    - new solutions wait in memory and go in with one short transaction, so no
+      write lock is ever held while a puzzle is being solved (several --batch
+      workers share one file); the file is in WAL mode, so lookups never wait
+      on a writer, and a store that still fails is just dropped
+'''
+import itertools
+import sqlite3
+
+import numpy as np
+
+SIZE = 9
+# (stack order, order inside each stack) -> one column order per row
+COLUMN_ORDERS = np.array([[3 * stacks[stack] + inside[stack][col] for stack in range(3) for col in range(3)]
+                          for stacks in itertools.permutations(range(3))
+                          for inside in itertools.product(itertools.permutations(range(3)), repeat=3)])
+PLACES = 10 ** np.arange(SIZE - 1, -1, -1, dtype=np.int64)
+BITS = 2 ** np.arange(SIZE - 1, -1, -1, dtype=np.int64)
+MAX_STATES = 200000
+PATTERN_TABLE = []
+
+def pattern_table() -> np.ndarray:
+    """Where the filled spaces of a row end up under every column order
+
+    A filled space always relabels to something bigger than an empty one, so
+    the filled / empty pattern of a row decides most comparisons on its own.
+
+    Returns:
+        np.ndarray: (512, column orders) pattern (bit 8 - column set when filled)
+    """
+    if not PATTERN_TABLE:
+        filled = (np.arange(2 ** SIZE)[:, None] & BITS) > 0
+        PATTERN_TABLE.append(filled[:, COLUMN_ORDERS] @ BITS)
+    return PATTERN_TABLE[0]
+
+def canonical(values: list) -> tuple:
+    """The canonical form of a 9x9 puzzle and how to get there
+
+    Args:
+        values (list): 81 values, row by row (-1 for an empty space)
+
+    Returns:
+        tuple: canonical form (81-character string, '0' for an empty space) and
+               the transform (transposed, row order, column order, digit labels),
+               or (None, None) if the puzzle is too symmetric to pin down cheaply
+    """
+    grid = np.array([max(value, 0) for value in values], dtype=np.int64).reshape(SIZE, SIZE)
+    grids = np.stack([grid, grid.T])
+    patterns = (grids > 0) @ BITS
+    table = pattern_table()
+
+    # every state is one partial transform that still gives the smallest rows so far,
+    # starting from the (transpose, column order) pairs that can give the emptiest first row
+    first = table[patterns]
+    (transposed, columns) = np.nonzero((first == first.min()).any(axis=1))
+    count = len(transposed)
+    labels = np.zeros((count, SIZE + 1), dtype=np.int64)
+    next_label = np.ones(count, dtype=np.int64)
+    rows = np.zeros((count, 0), dtype=np.int64)
+    canon = []
+
+    for row in range(SIZE):
+        # which source rows may come next: a new band starts every third row
+        used = np.zeros((len(rows), SIZE), dtype=bool)
+        np.put_along_axis(used, rows, True, axis=1)
+        if row % 3 == 0:
+            band_used = used.reshape(-1, 3, 3).any(axis=2)
+            allowed = ~np.repeat(band_used, 3, axis=1)
+        else:
+            band = rows[:, row - 1] // 3
+            allowed = (np.arange(SIZE) // 3 == band[:, None]) & ~used
+        (state, source) = np.nonzero(allowed)
+
+        # the filled / empty pattern settles most candidates before any relabeling
+        shapes = table[patterns[transposed[state], source], columns[state]]
+        best = shapes == shapes.min()
+        (state, source) = (state[best], source[best])
+
+        cells = np.take_along_axis(grids[transposed[state], source], COLUMN_ORDERS[columns[state]], axis=1)
+        state_labels = labels[state]
+        state_next = next_label[state]
+        everyone = np.arange(len(state))
+        for col in range(SIZE):
+            digit = cells[:, col]
+            fresh = (digit > 0) & (state_labels[everyone, digit] == 0)
+            state_labels[everyone[fresh], digit[fresh]] = state_next[fresh]
+            state_next += fresh
+            cells[:, col] = state_labels[everyone, digit]
+
+        keys = cells @ PLACES
+        keep = keys == keys.min()
+        if keep.sum() > MAX_STATES:
+            return None, None
+        canon.append(cells[np.argmax(keep)])
+
+        (transposed, columns) = (transposed[state[keep]], columns[state[keep]])
+        rows = np.concatenate([rows[state[keep]], source[keep][:, None]], axis=1)
+        (labels, next_label) = (state_labels[keep], state_next[keep])
+
+    # digits the puzzle never uses get the leftover labels in order
+    digit_labels = labels[0].tolist()
+    spare = iter(range(int(next_label[0]), SIZE + 1))
+    for digit in range(1, SIZE + 1):
+        if not digit_labels[digit]:
+            digit_labels[digit] = next(spare)
+
+    transform = (int(transposed[0]), rows[0].tolist(), COLUMN_ORDERS[columns[0]].tolist(), digit_labels)
+    return ''.join(str(value) for value in np.concatenate(canon).tolist()), transform
+
+def to_canonical(values: list, transform: tuple) -> list:
+    """Apply a transform from canonical() to a (solved) board
+
+    Returns:
+        list: 81 values in the canonical orientation and labels
+    """
+    (transposed, rows, columns, digit_labels) = transform
+    grid = np.array(values).reshape(SIZE, SIZE)
+    if transposed:
+        grid = grid.T
+    return [digit_labels[value] if value > 0 else -1 for value in grid[rows][:, columns].ravel().tolist()]
+
+def from_canonical(values: list, transform: tuple) -> list:
+    """Undo a transform from canonical()
+
+    Returns:
+        list: 81 values in the original orientation and labels
+    """
+    (transposed, rows, columns, digit_labels) = transform
+    digits = [0] * (SIZE + 1)
+    for (digit, label) in enumerate(digit_labels):
+        digits[label] = digit
+
+    grid = np.zeros((SIZE, SIZE), dtype=np.int64)
+    grid[np.ix_(rows, columns)] = np.array([digits[value] if value > 0 else -1 for value in values]).reshape(SIZE, SIZE)
+    if transposed:
+        grid = grid.T
+    return grid.ravel().tolist()
+
+class SolutionCache:
+    """sqlite store of solved puzzles, keyed by canonical form
+
+    Properties:
+        hits: lookups answered from the store
+        misses: lookups that had to be solved
+        dropped: new solutions that couldn't be written (the file was busy)
+    """
+    def __init__(self, path: str, commit_every: int = 100):
+        """
+        Args:
+            path (str): sqlite database file (created if it's missing)
+            commit_every (int, optional): new solutions written per transaction. Defaults to 100.
+        """
+        # autocommit: nothing is left open between statements
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS solutions (puzzle TEXT PRIMARY KEY, solution TEXT)')
+        self._commit_every = commit_every
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def solve(self, values: list, solver) -> list:
+        """Look a puzzle up, or solve and remember it
+
+        Args:
+            values (list): 81 values, row by row (-1 for an empty space)
+            solver (function): values -> solved values, or None if there is no solution
+
+        Returns:
+            list: the solved values, or None if there is no solution
+        """
+        (key, transform) = canonical(values)
+        if key is None:
+            self.misses += 1
+            return solver(values)
+
+        if key in self._pending:
+            found = (self._pending[key],)
+        else:
+            try:
+                found = self._db.execute('SELECT solution FROM solutions WHERE puzzle = ?', (key,)).fetchone()
+            except sqlite3.OperationalError:
+                found = None # busy: solve it instead
+        if found:
+            self.hits += 1
+            if found[0] is None:
+                return None
+            return from_canonical([int(value) for value in found[0]], transform)
+
+        self.misses += 1
+        solution = solver(values)
+        self._pending[key] = None if solution is None else ''.join(str(value) for value in to_canonical(solution, transform))
+        if len(self._pending) >= self._commit_every:
+            self.commit()
+        return solution
+
+    def commit(self) -> None:
+        """Write the new solutions in one short transaction (dropped if the file stays busy)"""
+        if not self._pending:
+            return
+        try:
+            with self._db:
+                self._db.execute('BEGIN IMMEDIATE')
+                self._db.executemany('INSERT OR REPLACE INTO solutions VALUES (?, ?)', self._pending.items())
+        except sqlite3.OperationalError:
+            self.dropped += len(self._pending)
+        self._pending = {}
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
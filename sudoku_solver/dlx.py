@@ -0,0 +1,208 @@
+'''Dancing Links (Algorithm X) Sudoku solver
+
+Inspired by:
+    Donald Knuth, "Dancing Links" (https://arxiv.org/abs/cs/0011047)
+
+Skills:
+    - exact cover
+    - doubly-linked lists (in flat arrays)
+
+Add-ons
+    - Sudoku as exact cover: one row per (space, digit) choice, one column per
+      constraint (each space filled, each digit once per row / column / box)
+    - the links live in parallel lists indexed by node number rather than one
+      Python object per node, which keeps the matrix small and fast to walk
+    - always covers the column with the fewest rows left (Knuth's S heuristic)
+    - optional metrics (see metrics.py): rows tried, backtracks, depth
+'''
+from metrics import phase
+
+class DancingLinks:
+    """Exact-cover matrix for one board size
+
+    A matrix is changed in place while it solves, so use a new one per puzzle.
+
+    Properties:
+        left, right, up, down: links of every node (node 0 is the root,
+                               nodes 1..columns are the column headers)
+        column: header of every node
+        row_id: the (space * size + digit - 1) choice a node belongs to
+        count: number of rows left in each column (indexed by header)
+        stats: SolverStats to count into, or None
+    """
+    def __init__(self, box_size: int = 3, stats=None):
+        self.box_size = box_size
+        self.stats = stats
+        self.size = size = box_size * box_size
+        spaces = size * size
+        columns = 4 * spaces
+
+        # the root and the column headers start out as one circular list
+        self.left = [columns] + list(range(columns))
+        self.right = list(range(1, columns + 1)) + [0]
+        self.up = list(range(columns + 1))
+        self.down = list(range(columns + 1))
+        self.column = list(range(columns + 1))
+        self.row_id = [-1] * (columns + 1)
+        self.count = [0] * (columns + 1)
+        self.first = [] # first node of each row
+
+        for space in range(spaces):
+            (row, col) = divmod(space, size)
+            box = (row // box_size) * box_size + col // box_size
+            for digit in range(size):
+                headers = (1 + space,
+                           1 + spaces + row * size + digit,
+                           1 + 2 * spaces + col * size + digit,
+                           1 + 3 * spaces + box * size + digit)
+                self._add_row(space * size + digit, headers)
+
+    def _add_row(self, row_id: int, headers: tuple) -> None:
+        first = len(self.column)
+        for (offset, header) in enumerate(headers):
+            node = first + offset
+            # link into the bottom of the column
+            self.column.append(header)
+            self.row_id.append(row_id)
+            self.up.append(self.up[header])
+            self.down.append(header)
+            self.down[self.up[header]] = node
+            self.up[header] = node
+            self.count[header] += 1
+            # and into the (circular) row
+            self.left.append(first + (offset - 1) % len(headers))
+            self.right.append(first + (offset + 1) % len(headers))
+        self.first.append(first)
+
+    def cover(self, header: int) -> None:
+        (left, right, up, down, column, count) = (self.left, self.right, self.up, self.down, self.column, self.count)
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        node = down[header]
+        while node != header:
+            other = right[node]
+            while other != node:
+                down[up[other]] = down[other]
+                up[down[other]] = up[other]
+                count[column[other]] -= 1
+                other = right[other]
+            node = down[node]
+
+    def uncover(self, header: int) -> None:
+        (left, right, up, down, column, count) = (self.left, self.right, self.up, self.down, self.column, self.count)
+        node = up[header]
+        while node != header:
+            other = left[node]
+            while other != node:
+                count[column[other]] += 1
+                down[up[other]] = other
+                up[down[other]] = other
+                other = left[other]
+            node = up[node]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def select(self, row_id: int) -> bool:
+        """Put a choice in the solution up front (a given)
+
+        Returns:
+            bool: False if it clashes with an earlier choice
+        """
+        first = self.first[row_id]
+        for node in range(first, first + 4):
+            header = self.column[node]
+            # a covered column has been unlinked from the header list
+            if self.right[self.left[header]] != header:
+                return False
+            self.cover(header)
+        return True
+
+    def _search(self, solution: list, depth: int = 1) -> bool:
+        (right, down, count, column, stats) = (self.right, self.down, self.count, self.column, self.stats)
+        if right[0] == 0:
+            return True
+
+        # the column with the fewest rows left
+        header = right[0]
+        best = header
+        while header != 0:
+            if count[header] < count[best]:
+                best = header
+                if count[best] <= 1:
+                    break
+            header = right[header]
+        if count[best] == 0:
+            return False
+
+        self.cover(best)
+        node = down[best]
+        while node != best:
+            solution.append(self.row_id[node])
+            # row ids hold digit - 1, the stats take the digit itself like the other engines
+            (space, digit) = divmod(self.row_id[node], self.size)
+            if stats:
+                stats.guess(depth, space, digit + 1)
+            other = right[node]
+            while other != node:
+                self.cover(column[other])
+                other = right[other]
+
+            if self._search(solution, depth + 1):
+                return True
+
+            if stats:
+                stats.backtrack(depth, space, digit + 1)
+            solution.pop()
+            other = self.left[node]
+            while other != node:
+                self.uncover(column[other])
+                other = self.left[other]
+            node = down[node]
+        self.uncover(best)
+        return False
+
+    def solve(self, values: list) -> list:
+        """Solve a puzzle
+
+        Args:
+            values (list): every space, row by row (-1 for an empty space)
+
+        Returns:
+            list: the solved values, or None if there is no solution
+        """
+        solution = []
+        with phase(self.stats, 'givens'):
+            for (space, value) in enumerate(values):
+                if 1 <= value <= self.size:
+                    if not self.select(space * self.size + value - 1):
+                        return None
+                    solution.append(space * self.size + value - 1)
+
+        with phase(self.stats, 'search'):
+            if not self._search(solution):
+                return None
+
+        result = [-1] * (self.size * self.size)
+        for row_id in solution:
+            (space, digit) = divmod(row_id, self.size)
+            result[space] = digit + 1
+        return result
+
+def solve_dlx(board, stats=None) -> bool:
+    """Solve a Board in place with the Dancing Links engine
+
+    Args:
+        board (Board): A Sudoku board object
+        stats (SolverStats, optional): metrics to count into. Defaults to None.
+
+    Returns:
+        bool: Does a solution exist
+    """
+    with phase(stats, 'build'):
+        links = DancingLinks(board.box_size, stats)
+    solution = links.solve(board.values())
+    if solution is None:
+        return False
+
+    board.fill(solution)
+    return True
@@ -0,0 +1,265 @@
+'''Generate Sudoku puzzles with a unique solution
+
+Skills:
+    - randomized search
+    - multiprocessing (imap_unordered over seeds)
+
+Add-ons
+    - a random full grid: the boxes on the diagonal don't see each other, so they
+      are filled with random permutations and the propagation engine does the rest
+    - clues come out in random order, and one only stays out if the puzzle
+      still has exactly one solution: no solution with a different digit there
+    - difficulty is rated by how much search the propagation engine needs:
+      easy puzzles fall to naked / hidden singles alone, harder ones need guesses
+    - --difficulty keeps clues that would push a puzzle past the target; a
+      puzzle that comes out too easy is steered harder: a couple of clues go
+      back in, the rest is dug again, and the change stays if it didn't make
+      the puzzle any easier
+    - a seed that can't hit the target gives up, and the run stops with an
+      error once too many seeds in a row have given up
+    - every puzzle comes from its own seed, so a run is reproducible with --seed
+      and spreads across all cores
+    - output is one puzzle per line in the format --board (and --batch) takes
+
+usage:
+    python generator.py --count 1000 --difficulty hard > puzzles.txt
+    python sudoku.py --batch puzzles.txt --unique
+'''
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from propagate import PropagationSolver
+from sudoku import Board
+
+# most search nodes each rating allows (9x9 minimal puzzles rarely need more than 15)
+DIFFICULTY = {
+    'easy': 0,
+    'medium': 2,
+    'hard': 8,
+    'expert': None,
+}
+MAX_TRIES = 10
+STEER_STEPS = 30
+STEER_CLUES = 2 # clues put back per steering step
+MAX_FAILED_SEEDS = 50
+
+class RatingSolver(PropagationSolver):
+    """Propagation solver that counts its search nodes
+
+    Properties:
+        nodes: branching points visited by the last solve / count
+    """
+    def __init__(self, box_size: int = 3):
+        super().__init__(box_size)
+        self.nodes = 0
+
+    def _choose(self, cand: list) -> int:
+        space = super()._choose(cand)
+        if space >= 0:
+            self.nodes += 1
+        return space
+
+    def unique_without(self, values: list, space: int, clue: int) -> bool:
+        """Is a puzzle still unique with one of its clues taken out?
+
+        The puzzle without the clue still has the old solution, so it is unique
+        exactly when no solution puts a different digit there. That is one search
+        with the clue's digit struck from the space, and propagation usually
+        finishes it off without any guessing.
+
+        Args:
+            values (list): the puzzle with the clue already taken out
+            space (int): where the clue was
+            clue (int): the clue's digit
+
+        Returns:
+            bool: True if the solution is still unique
+        """
+        cand = self.start(values)
+        if cand is None or not self._eliminate(cand, [(space, 1 << (clue - 1))], []):
+            return True
+        return not self._search(cand, [])
+
+    def rate(self, values: list) -> tuple:
+        """Rate a puzzle by the search it takes to solve
+
+        Args:
+            values (list): every space, row by row (-1 for an empty space)
+
+        Returns:
+            tuple: difficulty name, search nodes
+        """
+        self.nodes = 0
+        self.solve(values)
+        for (name, most) in DIFFICULTY.items():
+            if most is None or self.nodes <= most:
+                return name, self.nodes
+
+def full_grid(rng: random.Random, box_size: int = 3) -> list:
+    """A random solved board
+
+    Args:
+        rng (random.Random): random source
+        box_size (int, optional): width of a box. Defaults to 3.
+
+    Returns:
+        list: every space, row by row
+    """
+    size = box_size * box_size
+    values = [-1] * (size * size)
+    for box in range(box_size):
+        digits = rng.sample(range(1, size + 1), size)
+        for row in range(box_size):
+            for col in range(box_size):
+                values[(box * box_size + row) * size + box * box_size + col] = digits[row * box_size + col]
+
+    solution = PropagationSolver(box_size).solve(values)
+    # the engine always tries the lowest digit first, so shuffle the labels too
+    labels = rng.sample(range(1, size + 1), size)
+    return [labels[value - 1] for value in solution]
+
+def least_nodes(difficulty: str) -> int:
+    """Fewest search nodes a rating takes (one more than the rating below it allows)"""
+    least = 0
+    if difficulty not in DIFFICULTY:
+        return least
+    for (name, most) in DIFFICULTY.items():
+        if name == difficulty:
+            return least
+        least = most + 1
+    return 0
+
+def dig(solver: RatingSolver, values: list, rng: random.Random, most: int = None) -> None:
+    """Take out every clue (in random order) that keeps the solution unique
+
+    Args:
+        solver (RatingSolver): solver to check with
+        values (list): the puzzle (changed in place)
+        rng (random.Random): random source
+        most (int, optional): keep clues that would need more search nodes than this. Defaults to None.
+    """
+    spaces = [space for (space, value) in enumerate(values) if value != -1]
+    rng.shuffle(spaces)
+    for space in spaces:
+        clue = values[space]
+        values[space] = -1
+        if not solver.unique_without(values, space, clue):
+            values[space] = clue
+        elif most is not None and solver.rate(values)[1] > most:
+            values[space] = clue
+
+def make_puzzle(rng: random.Random, box_size: int = 3, difficulty: str = None) -> tuple:
+    """Dig clues out of a random full grid while the solution stays unique
+
+    Args:
+        rng (random.Random): random source
+        box_size (int, optional): width of a box. Defaults to 3.
+        difficulty (str, optional): key of DIFFICULTY to aim for. Defaults to None (any).
+
+    Returns:
+        tuple: puzzle values (-1 for an empty space), difficulty name, search nodes
+    """
+    solver = RatingSolver(box_size)
+    most = DIFFICULTY.get(difficulty)
+    solution = full_grid(rng, box_size)
+    values = list(solution)
+    dig(solver, values, rng, most)
+    nodes = solver.rate(values)[1]
+
+    # too easy: put a few clues back, dig somewhere else, and keep it unless it got easier
+    least = least_nodes(difficulty)
+    for _ in range(STEER_STEPS):
+        if nodes >= least:
+            break
+        trial = list(values)
+        for space in rng.sample([space for (space, value) in enumerate(trial) if value == -1], STEER_CLUES):
+            trial[space] = solution[space]
+        dig(solver, trial, rng, most)
+        trial_nodes = solver.rate(trial)[1]
+        if trial_nodes >= nodes:
+            (values, nodes) = (trial, trial_nodes)
+
+    return (values,) + solver.rate(values)
+
+def _generate(job: tuple) -> tuple:
+    # runs in a worker: one puzzle per seed, retrying until the rating matches
+    (seed, box_size, difficulty) = job
+    rng = random.Random(seed)
+    for _ in range(MAX_TRIES):
+        (values, rating, nodes) = make_puzzle(rng, box_size, difficulty)
+        if difficulty is None or rating == difficulty:
+            return values, rating, nodes
+    return None
+
+def generate(count: int, box_size: int = 3, difficulty: str = None, workers: int = None, seed: int = None):
+    """Generate distinct puzzles
+
+    Args:
+        count (int): number of puzzles
+        box_size (int, optional): width of a box. Defaults to 3.
+        difficulty (str, optional): key of DIFFICULTY. Defaults to None (any).
+        workers (int, optional): worker processes. Defaults to the CPU count.
+        seed (int, optional): seed for a reproducible run. Defaults to None.
+
+    Raises:
+        RuntimeError: MAX_FAILED_SEEDS seeds in a row couldn't make the difficulty
+
+    Yields:
+        tuple: puzzle values (-1 for an empty space), difficulty name, search nodes
+    """
+    workers = workers or os.cpu_count() or 1
+    seeds = random.Random(seed)
+    seen = set()
+    failed = 0
+
+    def jobs():
+        while True:
+            yield (seeds.getrandbits(64), box_size, difficulty)
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(_generate, jobs(), chunksize=4):
+            if result is None:
+                failed += 1
+                if failed >= MAX_FAILED_SEEDS:
+                    raise RuntimeError(f'{failed} seeds in a row failed to make a puzzle rated {difficulty}')
+                continue
+            failed = 0
+            if tuple(result[0]) in seen:
+                continue
+            seen.add(tuple(result[0]))
+            yield result
+            if len(seen) == count:
+                break
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate Sudoku puzzles with exactly one solution.")
+    parser.add_argument("--count","-n",action="store",type=int,default=10,help="Number of puzzles to generate")
+    parser.add_argument("--difficulty",action="store",choices=list(DIFFICULTY),default=None,help="Only keep puzzles with this rating")
+    parser.add_argument("--box-size",action="store",type=int,default=3,help="Width of a box: 3 for 9x9, 4 for 16x16")
+    parser.add_argument("--delimit","-d",action="store",default=",",help="The delimiter between spaces")
+    parser.add_argument("--workers","-w",action="store",type=int,default=None,help="Worker processes (default: CPU count)")
+    parser.add_argument("--seed",action="store",type=int,default=None,help="Seed for a reproducible run")
+    parser.add_argument("--show",default=False,action="store_true",help="Print each puzzle as a board (on stderr) too")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    ratings = {}
+    try:
+        for (values, rating, nodes) in generate(args.count,args.box_size,args.difficulty,args.workers,args.seed):
+            ratings[rating] = ratings.get(rating,0) + 1
+            puzzle = Board(','.join('' if value == -1 else str(value) for value in values),box_size=args.box_size)
+            print(args.delimit.join('' if value == -1 else str(value) for value in puzzle.values()))
+            if args.show:
+                print(f'{rating} ({nodes} search nodes, {len(values) - values.count(-1)} clues)',file=sys.stderr)
+                print(puzzle,file=sys.stderr)
+    except RuntimeError as error:
+        print(f'generator.py: error: {error}',file=sys.stderr)
+        sys.exit(1)
+
+    seconds = time.perf_counter() - started
+    generated = sum(ratings.values())
+    print(f'{generated} puzzles in {seconds:.2f}s ({generated / max(seconds,1e-9) * 60:.0f} puzzles/minute) {ratings}',file=sys.stderr)
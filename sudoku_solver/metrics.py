@@ -0,0 +1,103 @@
+'''Counters, timers and a sampled trace for the Sudoku engines
+
+Skills:
+    - context managers (timing a phase)
+    - collections.deque as a ring buffer
+    - json
+
+Add-ons
+    - every engine takes an optional SolverStats and counts into it: search
+      nodes, backtracks, the deepest guess and the candidates propagation removed
+    - counting is a few integer additions per search node, so it is cheap
+      enough to leave on; with no SolverStats the engines skip it entirely
+    - phases (parse, propagate, search, ...) are timed with phase()
+    - the trace keeps every Nth guess / backtrack in a fixed-size buffer and
+      is only written out at the end, so tracing never waits on the terminal
+'''
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+class SolverStats:
+    """Metrics for one solve (or many, they just add up)
+
+    Properties:
+        nodes: search nodes visited (guesses tried)
+        backtracks: guesses taken back
+        max_depth: deepest level of nested guesses
+        propagations: candidates removed by propagation
+        phases: seconds spent in each phase
+        trace: sampled events, oldest first (None when tracing is off)
+    """
+    def __init__(self, trace_every: int = 0, trace_size: int = 1000):
+        """
+        Args:
+            trace_every (int, optional): keep every Nth event, 0 for no trace. Defaults to 0.
+            trace_size (int, optional): most events kept (the oldest are dropped). Defaults to 1000.
+        """
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.propagations = 0
+        self.phases = {}
+        self.trace = deque(maxlen=trace_size) if trace_every else None
+        self._trace_every = trace_every
+        self._events = 0
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - started
+
+    def guess(self, depth: int, space: int, digit: int) -> None:
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.trace is not None:
+            self._record('guess', depth, space, digit)
+
+    def backtrack(self, depth: int, space: int, digit: int) -> None:
+        self.backtracks += 1
+        if self.trace is not None:
+            self._record('backtrack', depth, space, digit)
+
+    def _record(self, event: str, depth: int, space: int, digit: int) -> None:
+        self._events += 1
+        if self._events % self._trace_every == 0:
+            self.trace.append({'event': event, 'number': self._events, 'depth': depth, 'space': space, 'digit': digit})
+
+    def as_dict(self) -> dict:
+        """The metrics as plain data
+
+        Returns:
+            dict: counters, phase times (ms) and the trace if there is one
+        """
+        metrics = {
+            'nodes': self.nodes,
+            'backtracks': self.backtracks,
+            'max_depth': self.max_depth,
+            'propagations': self.propagations,
+            'phases_ms': {name: round(seconds * 1000, 3) for (name, seconds) in self.phases.items()},
+        }
+        if self.trace is not None:
+            metrics['trace_every'] = self._trace_every
+            metrics['trace'] = list(self.trace)
+        return metrics
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+def phase(stats: SolverStats, name: str):
+    """Time a phase into stats, or do nothing if there are no stats
+
+    Args:
+        stats (SolverStats): where the time goes (None to skip timing)
+        name (str): name of the phase
+    """
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
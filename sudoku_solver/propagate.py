@@ -0,0 +1,338 @@
+'''Constraint-propagation Sudoku solver
+
+Skills:
+    - bit manipulation (candidate masks)
+    - constraint propagation
+    - search with an undo trail instead of copies
+
+Add-ons
+    - minimum remaining values: always branch on the space with the fewest candidates,
+      or, when that is 3 or more, on a digit with fewer places left in some unit
+      (without that, puzzles like Norvig's "hard1" sent the search down dead
+      subtrees for close to a minute; DLX picks its columns the same way)
+    - naked singles: a space with one candidate left removes it from all its peers
+    - hidden singles: a digit with one place left in a row / column / box goes there
+    - every change is recorded on a trail, so backtracking just replays it in reverse
+    - solution counting (count_solutions) walks the same search tree, stopping
+      as soon as it has seen `limit` solutions (2 is enough to prove uniqueness)
+    - optional metrics (see metrics.py): guesses, backtracks, depth, removals
+'''
+from metrics import phase
+
+UNITS_CACHE = {}
+
+def build_units(box_size: int) -> tuple:
+    """Precompute the rows, columns, boxes and peers of a board
+
+    Args:
+        box_size (int): width of a box (3 for a 9x9 board)
+
+    Returns:
+        tuple: units (list of space lists), units of each space, peers of each space
+    """
+    if box_size not in UNITS_CACHE:
+        size = box_size * box_size
+        rows = [[row * size + col for col in range(size)] for row in range(size)]
+        cols = [[row * size + col for row in range(size)] for col in range(size)]
+        boxes = [[(box_row + row) * size + box_col + col for row in range(box_size) for col in range(box_size)]
+                 for box_row in range(0, size, box_size) for box_col in range(0, size, box_size)]
+        units = rows + cols + boxes
+
+        space_units = [[] for _ in range(size * size)]
+        for unit in units:
+            for space in unit:
+                space_units[space].append(unit)
+        peers = [sorted({peer for unit in space_units[space] for peer in unit} - {space})
+                 for space in range(size * size)]
+        UNITS_CACHE[box_size] = (units, space_units, peers)
+
+    return UNITS_CACHE[box_size]
+
+class PropagationSolver:
+    """Candidate-mask solver with propagation and MRV search
+
+    Properties:
+        size: digits per row (box_size squared)
+        full: mask with every candidate set
+        units, space_units, peers: see build_units
+        stats: SolverStats to count into, or None
+    """
+    def __init__(self, box_size: int = 3, stats=None):
+        self.box_size = box_size
+        self.stats = stats
+        self.size = box_size * box_size
+        self.full = (1 << self.size) - 1
+        (self.units, self.space_units, self.peers) = build_units(box_size)
+
+    def _eliminate(self, cand: list, pending: list, trail: list) -> bool:
+        """Remove candidates and propagate the consequences
+
+        Args:
+            cand (list): candidate mask of every space (changed in place)
+            pending (list): (space, bits) pairs to remove
+            trail (list): (space, old mask) undo records
+
+        Returns:
+            bool: False if the board ran into a contradiction
+        """
+        peers = self.peers
+        space_units = self.space_units
+        while pending:
+            (space, bits) = pending.pop()
+            old = cand[space]
+            bits &= old
+            if not bits:
+                continue
+
+            mask = old & ~bits
+            if not mask:
+                return False
+            trail.append((space, old))
+            cand[space] = mask
+
+            # naked single: the last candidate can't be anywhere else nearby
+            if not mask & (mask - 1):
+                for peer in peers[space]:
+                    if cand[peer] & mask:
+                        pending.append((peer, mask))
+
+            # hidden single: a removed digit might have one place left in a unit
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                for unit in space_units[space]:
+                    place = -1
+                    for other in unit:
+                        if cand[other] & bit:
+                            if place >= 0:
+                                break
+                            place = other
+                    else:
+                        if place < 0:
+                            return False
+                        if cand[place] != bit:
+                            pending.append((place, cand[place] & ~bit))
+
+        return True
+
+    def _undo(self, cand: list, trail: list, mark: int) -> None:
+        while len(trail) > mark:
+            (space, old) = trail.pop()
+            cand[space] = old
+
+    def _choose(self, cand: list) -> int:
+        """Minimum remaining values: the unsolved space with the fewest candidates
+
+        Returns:
+            int: the space, or -1 if every space is solved
+        """
+        best = -1
+        best_count = self.size + 1
+        for (space, mask) in enumerate(cand):
+            if mask & (mask - 1):
+                count = mask.bit_count()
+                if count < best_count:
+                    best = space
+                    best_count = count
+                    if count == 2:
+                        break
+
+        return best
+
+    def _branches(self, cand: list) -> list:
+        """The choices to branch on: every candidate of the MRV space, or every
+        place of a digit that has fewer places than that left in one unit
+
+        Returns:
+            list: (space, digit bit) choices, or None if every space is solved
+        """
+        space = self._choose(cand)
+        if space < 0:
+            return None
+
+        options = cand[space]
+        best = options.bit_count()
+        branches = [(space, 1 << digit) for digit in range(self.size) if options >> digit & 1]
+        if best <= 2:
+            return branches
+
+        for unit in self.units:
+            open_digits = 0
+            for place in unit:
+                if cand[place] & (cand[place] - 1):
+                    open_digits |= cand[place]
+            while open_digits:
+                bit = open_digits & -open_digits
+                open_digits ^= bit
+                places = [place for place in unit if cand[place] & bit]
+                if len(places) < best:
+                    best = len(places)
+                    branches = [(place, bit) for place in places]
+                    if best == 2:
+                        return branches
+
+        return branches
+
+    def _search(self, cand: list, trail: list, depth: int = 1) -> bool:
+        branches = self._branches(cand)
+        if branches is None:
+            return True
+
+        stats = self.stats
+        for (space, bit) in branches:
+            mark = len(trail)
+            if stats:
+                stats.guess(depth, space, bit.bit_length())
+            if self._eliminate(cand, [(space, cand[space] & ~bit)], trail) and self._search(cand, trail, depth + 1):
+                return True
+            if stats:
+                stats.backtrack(depth, space, bit.bit_length())
+                stats.propagations += len(trail) - mark
+            self._undo(cand, trail, mark)
+
+        return False
+
+    def _count(self, cand: list, trail: list, limit: int, depth: int = 1) -> int:
+        branches = self._branches(cand)
+        if branches is None:
+            return 1
+
+        stats = self.stats
+        found = 0
+        for (space, bit) in branches:
+            if found >= limit:
+                break
+            mark = len(trail)
+            if stats:
+                stats.guess(depth, space, bit.bit_length())
+            if self._eliminate(cand, [(space, cand[space] & ~bit)], trail):
+                found += self._count(cand, trail, limit - found, depth + 1)
+            if stats:
+                stats.backtrack(depth, space, bit.bit_length())
+                stats.propagations += len(trail) - mark
+            self._undo(cand, trail, mark)
+
+        return found
+
+    def start(self, values: list) -> list:
+        """Candidate masks for a puzzle, with the givens already propagated
+
+        Args:
+            values (list): every space, row by row (-1 for an empty space)
+
+        Returns:
+            list: candidate masks, or None if the givens contradict each other
+        """
+        peers = self.peers
+        cand = [self.full] * (self.size * self.size)
+        # the givens knock their digit out of their peers directly, which is much
+        # cheaper than running each of them through _eliminate
+        for (space, value) in enumerate(values):
+            if 1 <= value <= self.size:
+                bit = 1 << (value - 1)
+                if not cand[space] & bit:
+                    return None
+                cand[space] = bit
+                for peer in peers[space]:
+                    cand[peer] &= ~bit
+
+        # then queue up the singles that left behind
+        pending = []
+        for (space, mask) in enumerate(cand):
+            if not mask:
+                return None
+            if not mask & (mask - 1):
+                pending.extend((peer, mask) for peer in peers[space] if cand[peer] & mask)
+        for unit in self.units:
+            seen = 0
+            twice = 0
+            for space in unit:
+                twice |= seen & cand[space]
+                seen |= cand[space]
+            if seen != self.full:
+                return None
+            once = seen & ~twice
+            for space in unit:
+                bits = cand[space] & once
+                while bits:
+                    bit = bits & -bits
+                    bits ^= bit
+                    pending.append((space, cand[space] & ~bit))
+
+        trail = []
+        if not self._eliminate(cand, pending, trail):
+            return None
+        if self.stats:
+            self.stats.propagations += len(trail)
+        return cand
+
+    def solve(self, values: list) -> list:
+        """Solve a puzzle
+
+        Args:
+            values (list): every space, row by row (-1 for an empty space)
+
+        Returns:
+            list: the solved values, or None if there is no solution
+        """
+        with phase(self.stats, 'propagate'):
+            cand = self.start(values)
+        if cand is None:
+            return None
+
+        trail = []
+        with phase(self.stats, 'search'):
+            if not self._search(cand, trail):
+                return None
+        if self.stats:
+            self.stats.propagations += len(trail)
+
+        return [mask.bit_length() for mask in cand]
+
+    def count(self, values: list, limit: int = 2) -> int:
+        """Count the solutions of a puzzle, up to a limit
+
+        Args:
+            values (list): every space, row by row (-1 for an empty space)
+            limit (int, optional): stop after this many solutions. Defaults to 2.
+
+        Returns:
+            int: number of solutions found, never more than limit
+        """
+        with phase(self.stats, 'propagate'):
+            cand = self.start(values)
+        if cand is None or limit < 1:
+            return 0
+
+        with phase(self.stats, 'search'):
+            return self._count(cand, [], limit)
+
+def solve_propagate(board, stats=None) -> bool:
+    """Solve a Board in place with the propagation engine
+
+    Args:
+        board (Board): A Sudoku board object
+        stats (SolverStats, optional): metrics to count into. Defaults to None.
+
+    Returns:
+        bool: Does a solution exist
+    """
+    solution = PropagationSolver(board.box_size, stats).solve(board.values())
+    if solution is None:
+        return False
+
+    board.fill(solution)
+    return True
+
+def count_solutions(board, limit: int = 2, stats=None) -> int:
+    """Count the solutions of a Board (the board itself is left alone)
+
+    Args:
+        board (Board): A Sudoku board object
+        limit (int, optional): stop after this many solutions. Defaults to 2.
+        stats (SolverStats, optional): metrics to count into. Defaults to None.
+
+    Returns:
+        int: number of solutions found, never more than limit
+    """
+    return PropagationSolver(board.box_size, stats).count(board.values(), limit)
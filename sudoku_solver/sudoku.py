@@ -15,57 +15,86 @@ Add-ons
     - output formatting
     - class / method refactoring instead of functional
     - parse string into puzzle
+    - any box size (--box-size 4 for 16x16, 5 for 25x25), multi-character
+      tokens split on the delimiter; '.' and '0' also mean an empty space
+    - batch mode over a file of puzzles (--batch), see batch.py
+    - selectable solving engines (--engine), see propagate.py, dlx.py and vector.py
+    - solution counting (--count N) and a uniqueness check (--unique)
+    - solver metrics as JSON (--verbose) with a sampled trace of the guesses
+      (--trace N), instead of printing the board on every guess; see metrics.py
+    - a solution cache keyed by canonical form (--cache), so a puzzle that was
+      solved before in any relabeled / shuffled / transposed version is looked
+      up instead of solved; see cache.py
+    - bitmask bookkeeping: per-row / per-column / per-box masks of the digits
+      already placed, plus a mask of the empty cells, all updated in O(1)
 '''
 import argparse
 
+from dlx import solve_dlx
+from metrics import SolverStats, phase
+from propagate import count_solutions, solve_propagate
+
 class Board:
-    def __init__(self,board:str,delimiter:str = ",",verbose:bool = False):
-        self._verbose = verbose
-        self._board = [
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-            [-1,-1,-1, -1,-1,-1, -1,-1,-1],
-        ]
-        puzzle = board.split(delimiter) # 0, 1, 2, 3, ... 80
-
-        while len(puzzle) < 81:
+    def __init__(self,board:str,delimiter:str = ",",*,box_size:int = 3):
+        self.box_size = box_size
+        self.size = box_size * box_size # 9 for a classic board, 16 for box_size 4, ...
+        self._board = [[-1 for _ in range(self.size)] for _ in range(self.size)]
+        puzzle = board.split(delimiter) # 0, 1, 2, 3, ... 80 (for a 9x9 board)
+
+        while len(puzzle) < self.size * self.size:
             puzzle.append('')
 
-        for space in range(81): # 0, 1, 2, 3, ... 80
-            row = space // 9
-            col = space % 9
-            try:
-                if puzzle[space] == '':
-                    self._board[row][col] = -1
-                else:
-                    self._board[row][col] = int(puzzle[space])
-            except IndexError:
+        for space in range(self.size * self.size): # 0, 1, 2, 3, ... 80
+            row = space // self.size
+            col = space % self.size
+            token = puzzle[space].strip()
+            if token in ('', '.', '0'):
                 self._board[row][col] = -1
+            else:
+                self._board[row][col] = int(token)
+
+        self._reset_masks()
+
+    def _reset_masks(self) -> None:
+        # bit (digit - 1) is set when the digit is already in that row / column / box
+        self._rows = [0] * self.size
+        self._cols = [0] * self.size
+        self._boxes = [0] * self.size
+        # bit (row * size + col) is set when the space is empty
+        self._empty = 0
+        for row in range(self.size):
+            for col in range(self.size):
+                if self._board[row][col] == -1:
+                    self._empty |= 1 << (row * self.size + col)
+                else:
+                    self._place(self._board[row][col],row,col)
 
     def __repr__(self):
         return "%s(%r)" % self.__class__,self._board
 
+    def _separator(self) -> str:
+        label = len(str(self.size - 1))
+        width = len(str(self.size)) + 1
+        return ' ' * (label + 1) + ' '.join(['-' * (self.box_size * (width + 1) + 1)] * self.box_size) + '\n'
+
     def __str__(self):
-        mystring = '    0  1  2    3  4  5    6  7  8\n'
-        mystring += '  ---------- ---------- ----------\n'
-        for row in range(9):
-            mystring += f'{row}|'
-            for col in range(9):
-                mystring += ' {: }'.format(self._board[row][col])
-                if col in [2,5]:
+        label = len(str(self.size - 1))
+        width = len(str(self.size)) + 1
+        mystring = ' ' * (label + 1)
+        for col in range(self.size):
+            mystring += ' {:>{}}'.format(col,width)
+            if col % self.box_size == self.box_size - 1 and col != self.size - 1:
+                mystring += '  '
+        mystring += '\n' + self._separator()
+        for row in range(self.size):
+            mystring += '{:>{}}|'.format(row,label)
+            for col in range(self.size):
+                mystring += ' {:>{}}'.format(self._board[row][col],width)
+                if col % self.box_size == self.box_size - 1:
                     mystring += ' |'
-                if col == 8:
-                    mystring += ' |\n'
-            if row in [2,5,8]:
-                mystring += '  ---------- ---------- ----------\n'
+            mystring += '\n'
+            if row % self.box_size == self.box_size - 1:
+                mystring += self._separator()
 
         return mystring
 
@@ -78,11 +107,11 @@ class Board:
         Returns:
             tuple: row, column of the empty space. returns (None,None) if there are no empty spaces
         """
-        for row in range(9):
-            if -1 in self._board[row]:
-                return row, self._board[row].index(-1)
-        
-        return None,None
+        if not self._empty:
+            return None,None
+
+        # the lowest set bit is the first empty space, reading left to right, top to bottom
+        return divmod((self._empty & -self._empty).bit_length() - 1, self.size)
     
     def print_title(self,title:str):
         """print a title above the board
@@ -90,13 +119,39 @@ class Board:
         Args:
             title (str): title to print
         """
-        if len(title) > 34:
-            new_title = title[:34]
+        width = len(self._separator()) - 1
+        if len(title) > width:
+            new_title = title[:width]
             title = new_title
 
-        print('{:^34}'.format(title))
-        print('{:^34}'.format("-"*len(title)))
+        print('{:^{}}'.format(title,width))
+        print('{:^{}}'.format("-"*len(title),width))
         
+    def _place(self, guess: int, row: int, col: int) -> None:
+        bit = 1 << (guess - 1)
+        self._rows[row] |= bit
+        self._cols[col] |= bit
+        self._boxes[(row // self.box_size) * self.box_size + col // self.box_size] |= bit
+
+    def _remove(self, guess: int, row: int, col: int) -> None:
+        bit = ~(1 << (guess - 1))
+        self._rows[row] &= bit
+        self._cols[col] &= bit
+        self._boxes[(row // self.box_size) * self.box_size + col // self.box_size] &= bit
+
+    def candidates(self, row: int, col: int) -> int:
+        """Digits that could still go in a space
+
+        Args:
+            row (int): Row of the space
+            col (int): Column of the space
+
+        Returns:
+            int: bitmask, bit (digit - 1) is set for every digit that fits
+        """
+        used = self._rows[row] | self._cols[col] | self._boxes[(row // self.box_size) * self.box_size + col // self.box_size]
+        return ~used & ((1 << self.size) - 1)
+
     def is_valid(self, guess: int, row: int, col: int) -> bool:
         """Check if the guess is valid for the current board
 
@@ -108,58 +163,56 @@ class Board:
         Returns:
             bool: does it go there?
         """
-        # If the guess is already in the row, return False
-        # Alternative method:
-        #   row_vals = puzzle_state[row]
-        #   if guess in row_vals:
-        if guess in self._board[row]:
+        if not 1 <= guess <= self.size:
             return False
-        
-        # Check the column in each row. If it matches, return False
-        # Alternative method 1:
-        # col_vals = []
-        # for i in range(9):
-        #   col_vals.append(puzzle_state[i][col])
-        #
-        # Alternative method 2 (list comprehension):
-        # cols_vals = [puzzle_state[i][col] for i in range(9)]
-        #
-        # if guess in col_vals
-        for col_row in range(9):
-            if guess == self._board[col_row][col]:
-                return False
-        
-        # Check the "box". If the guess is already present, return False
-        # Alternative method:
-        # row_start / col_start : (row // 3) * 3 or (col // 3) * 3
-        # for loop from row_start to row_start + 3
-        row_box = row // 3 # 0, 1, or 2 depending on which set of 3 rows we're in
-        col_box = col // 3 # 0, 1, or 2 depending on which set of 3 cols we're in
-        for box_row in range((3 * row_box), (3 * row_box) + 3): # range(0,3) for rows 0,1,2... range(3,6) for 3,4,5... etc
-            for box_col in range((3 * col_box), (3 * col_box) + 3):
-                if guess == self._board[box_row][box_col]:
-                    return False
 
-        return True
+        # The row, column and box masks together hold every digit that is already
+        # "seen" from this space, so a single AND replaces scanning all three
+        used = self._rows[row] | self._cols[col] | self._boxes[(row // self.box_size) * self.box_size + col // self.box_size]
+        return not used & (1 << (guess - 1))
 
     def mark_guess(self, guess: int, row: int, col: int) -> bool:
         if self.is_valid(guess,row,col):
+            if self._board[row][col] != -1:
+                self._remove(self._board[row][col],row,col)
             self._board[row][col] = guess
-            if self._verbose:
-                self.print_title(f'Current Guess: {guess} @ {row},{col}')
-                print(self)
+            self._place(guess,row,col)
+            self._empty &= ~(1 << (row * self.size + col))
             return True
         return False
 
+    def values(self) -> list:
+        """Every space, row by row
+
+        Returns:
+            list: size * size values, -1 for an empty space
+        """
+        return [value for row in self._board for value in row]
+
+    def fill(self, values: list) -> None:
+        """Write a whole board (e.g. a solution from another engine) back in
+
+        Args:
+            values (list): size * size values, row by row, -1 for an empty space
+        """
+        for (space,value) in enumerate(values):
+            self._board[space // self.size][space % self.size] = value
+        self._reset_masks()
+
     def unmark_space(self,row:int,col:int) -> None:
-        self._board[row][col] = -1
+        if self._board[row][col] != -1:
+            self._remove(self._board[row][col],row,col)
+            self._board[row][col] = -1
+            self._empty |= 1 << (row * self.size + col)
 
-def solve_sudoku(board: Board) -> bool:
+def solve_sudoku(board: Board, stats: SolverStats = None, depth: int = 1) -> bool:
     """
     Solve the puzzle
 
     Args:
       board (Board): A Sudoku board object
+      stats (SolverStats, optional): metrics to count into. Defaults to None.
+      depth (int, optional): how many guesses deep this call is. Defaults to 1.
 
     Returns:
       bool: Does a solution exist
@@ -173,35 +226,117 @@ def solve_sudoku(board: Board) -> bool:
         return True
     
     # step 2: if there is a space to put a number, see what the valid guesses are and try one.
-    for guess in range(1,10): # range(1,10) gives 1, 2, 3, ... 9 (range(a,b) includes a but not b)
+    # the candidate mask already leaves out every digit in the row, column and box
+    candidates = board.candidates(row,col)
+    while candidates:
+        bit = candidates & -candidates # lowest remaining candidate first, same order as range(1,10)
+        candidates ^= bit
+        guess = bit.bit_length()
         # step 3 & 4 are in the class now
+        if stats:
+            stats.guess(depth,row * board.size + col,guess)
         if board.mark_guess(guess,row,col):
-            if solve_sudoku(board):
+            if solve_sudoku(board,stats,depth + 1):
                 return True
 
         # step 5: reset space to -1 if it's not valid
+        if stats:
+            stats.backtrack(depth,row * board.size + col,guess)
         board.unmark_space(row,col)        
 
     # step 6: if nothing works, return False
     return False
 
+def solve_vector(board: Board, stats: SolverStats = None) -> bool:
+    # numpy is only needed by this engine, so it is imported on first use
+    from vector import solve_vector
+    return solve_vector(board,stats)
+
+# Every engine takes a Board (and optionally a SolverStats), solves it in place
+# and returns whether a solution exists
+ENGINES = {
+    'backtrack': solve_sudoku,
+    'propagate': solve_propagate,
+    'dlx': solve_dlx,
+    'vector': solve_vector,
+}
+
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="A brute-force Sudoku puzzle solver.")
+    parser = argparse.ArgumentParser(description="A Sudoku puzzle solver (9x9 and larger).")
     parser.add_argument("--board","-b",action="store",help="A string-representation of the starting sudoku board.",default="")
     parser.add_argument("--delimit","-d",action="store",default=",",help="The delimiter to split the board on")
-    parser.add_argument("--verbose","-v",default=False,action="store_true",help="Be verbose about the solving process. Print out each guess and state")
+    parser.add_argument("--box-size","-n",action="store",type=int,default=3,help="Width of a box: 3 for 9x9, 4 for 16x16, 5 for 25x25")
+    parser.add_argument("--engine","-e",action="store",choices=list(ENGINES),default=None,help="The solving engine to use (default: backtrack, propagate for --batch)")
+    parser.add_argument("--count",action="store",type=int,default=None,metavar="LIMIT",help="Count solutions (stopping at LIMIT) instead of solving")
+    parser.add_argument("--unique",default=False,action="store_true",help="Check that the puzzle has exactly one solution (same as --count 2)")
+    parser.add_argument("--batch",action="store",metavar="FILE",help="Solve every puzzle in FILE (one per line, - for stdin)")
+    parser.add_argument("--output","-o",action="store",metavar="FILE",help="Write --batch solutions to FILE instead of stdout")
+    parser.add_argument("--workers","-w",action="store",type=int,default=None,help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--chunk",action="store",type=int,default=256,help="Puzzles per --batch task")
+    parser.add_argument("--cache",action="store",metavar="DB",help="Look solutions up in (and add them to) this sqlite cache (9x9 only)")
+    parser.add_argument("--verbose","-v",default=False,action="store_true",help="Report solver metrics (nodes, backtracks, depth, phase times) as JSON")
+    parser.add_argument("--trace",action="store",type=int,default=0,metavar="N",help="Add every Nth guess / backtrack to the metrics (implies --verbose)")
+    parser.add_argument("--trace-size",action="store",type=int,default=1000,help="Most trace events kept (the latest win)")
     args = parser.parse_args()
+    limit = 2 if args.unique else args.count
+    if args.engine is None:
+        # plain backtracking can take forever on one bad puzzle, which would stall a whole batch
+        args.engine = 'propagate' if args.batch else 'backtrack'
+    stats = SolverStats(args.trace,args.trace_size) if args.verbose or args.trace else None
+    if args.cache and (args.box_size != 3 or limit is not None):
+        parser.error("--cache only works for solving 9x9 boards")
+
+    if args.batch:
+        import sys
+        from batch import solve_batch
 
+        source = sys.stdin if args.batch == '-' else open(args.batch)
+        output = open(args.output,'w') if args.output else sys.stdout
+        with source, output:
+            (solved, seconds, hits) = solve_batch(source,output,args.engine,args.delimit,args.workers,args.chunk,args.box_size,limit,args.cache)
+        print(f'{solved} puzzles in {seconds:.2f}s ({solved / max(seconds,1e-9):.1f} puzzles/second)',file=sys.stderr)
+        if args.cache:
+            print(f'cache: {hits} of {solved} puzzles were hits ({hits / max(solved,1):.1%})',file=sys.stderr)
+        sys.exit(0)
+
+    if args.board == "" and args.box_size != 3:
+        parser.error("--board is required for box sizes other than 3")
     if args.board == "":
         board = "3,9,,,5,,,,,,,,2,,,,,5,,,,7,1,9,,8,,,5,,,6,8,,,,2,,6,,,3,,,,,,,,,,,,4,5,,,,,,,,,6,7,,,,5,,4,,1,,9,,,,2,,"
     else:
         board = args.board
     
-    puzzle = Board(board,args.delimit,args.verbose)
+    with phase(stats,'parse'):
+        puzzle = Board(board,args.delimit,box_size=args.box_size)
     puzzle.print_title("STARTING BOARD")
     print(puzzle)
+
+    if limit is not None:
+        found = count_solutions(puzzle,limit,stats)
+        if stats:
+            print(stats.to_json())
+        if args.unique:
+            print({0: 'This board is UNSOLVABLE', 1: 'This board has a UNIQUE solution'}.get(found,'This board has MULTIPLE solutions'))
+        else:
+            print(f'{found} solution(s) found' + (' (stopped at the limit)' if found == limit else ''))
+        raise SystemExit(0 if found == 1 or not args.unique else 1)
     
-    if solve_sudoku(puzzle):
+    with phase(stats,'solve'):
+        if args.cache:
+            from cache import SolutionCache
+
+            with SolutionCache(args.cache) as cache:
+                solution = cache.solve(puzzle.values(),lambda values: puzzle.values() if ENGINES[args.engine](puzzle,stats) else None)
+            print(f'cache: {"hit" if cache.hits else "miss"}')
+            solved = solution is not None
+            if solved:
+                puzzle.fill(solution)
+        else:
+            solved = ENGINES[args.engine](puzzle,stats)
+    if stats:
+        print(stats.to_json())
+
+    if solved:
         puzzle.print_title("SOLUTION FOUND")
         print(puzzle)
     else:
@@ -0,0 +1,168 @@
+'''Solve a batch of Sudoku puzzles at once with NumPy
+
+Skills:
+    - numpy vectorization (reshapes, reductions, bitwise ufuncs)
+    - constraint propagation
+
+Add-ons
+    - the whole batch is one candidate tensor: (puzzles x spaces) digit masks,
+      i.e. (puzzles x spaces x digits) with the digits packed into bits
+    - naked and hidden singles run for every puzzle in the same array
+      operations (rows, columns and boxes are just reshapes of the tensor),
+      and only the puzzles that changed go round again
+    - puzzles that singles can't finish go to the scalar propagation engine,
+      with everything the batch already worked out filled in
+    - puzzles that run into a contradiction come back as None
+    - optional metrics (see metrics.py): phase times, plus the scalar engine's counts
+'''
+import numpy as np
+
+from metrics import phase
+from propagate import PropagationSolver
+
+class VectorSolver:
+    """Batch singles propagation for one board size
+
+    Candidates are kept the way the scalar engines keep them, one digit mask per
+    space (bit digit - 1), so the tensor is (puzzles, spaces) with the digit
+    axis packed into the bits. That moves a ninth of the memory of a boolean
+    (puzzles, spaces, digits) tensor, and memory is what the array operations
+    are waiting on. A (puzzles, spaces) array also reshapes for free into
+    (puzzles, box row, row in box, box column, column in box), which makes
+    every row, column and box a reduction over two of those axes.
+
+    Properties:
+        box_size: width of a box
+        size: digits per row (box_size squared)
+        full: mask with every candidate set
+        stats: SolverStats to count into, or None
+    """
+    def __init__(self, box_size: int = 3, stats=None):
+        self.box_size = box_size
+        self.stats = stats
+        self.size = box_size * box_size
+        self.full = np.uint64((1 << self.size) - 1)
+
+    def candidates(self, puzzles: list) -> np.ndarray:
+        """Candidate masks for a list of puzzles
+
+        Args:
+            puzzles (list): value lists, row by row (-1 for an empty space)
+
+        Returns:
+            np.ndarray: (puzzles, spaces) digit masks
+        """
+        values = np.array(puzzles, dtype=np.int64).reshape(len(puzzles), self.size * self.size)
+        given = (values >= 1) & (values <= self.size)
+        bits = np.left_shift(np.uint64(1), np.where(given, values - 1, 0).astype(np.uint64))
+        return np.where(given, bits, self.full)
+
+    def _unique(self, units: np.ndarray) -> tuple:
+        # digits that appear exactly once in each unit, and all the digits that appear
+        # units: (puzzles, units, spaces of a unit)
+        once = np.zeros(units.shape[:2], dtype=np.uint64)
+        twice = np.zeros_like(once)
+        for space in range(units.shape[2]):
+            twice |= once & units[:, :, space]
+            once |= units[:, :, space]
+        return once & ~twice, once
+
+    def _step(self, cand: np.ndarray) -> tuple:
+        # one round of naked + hidden singles over (puzzles, spaces) masks
+        (n, size, count) = (self.box_size, self.size, len(cand))
+        grid = cand.reshape(count, n, n, n, n)
+
+        # naked singles: a placed digit is struck from every other space that sees it
+        single = (grid & (grid - np.uint64(1))) == 0
+        placed = np.where(single, grid, np.uint64(0))
+        dead = np.zeros(count, dtype=bool)
+        seen = np.uint64(0)
+        for axes in ((3, 4), (1, 2), (2, 4)): # rows, columns, boxes
+            digits = np.bitwise_or.reduce(placed, axis=axes, keepdims=True)
+            # the digits in a unit are all different exactly when adding them carries nothing
+            dead |= (placed.sum(axis=axes, dtype=np.uint64, keepdims=True) != digits).reshape(count, -1).any(axis=1)
+            seen = seen | digits
+        grid = np.where(single, grid, grid & ~seen)
+
+        # hidden singles: a digit with one place left in a unit goes there
+        rows = grid.reshape(count, size, size)
+        only = []
+        for units in (rows, rows.transpose(0, 2, 1), grid.transpose(0, 1, 3, 2, 4).reshape(count, size, size)):
+            (once, anywhere) = self._unique(units)
+            dead |= (anywhere != self.full).any(axis=1)
+            only.append(once)
+        only = only[0].reshape(count, n, n, 1, 1) | only[1].reshape(count, 1, 1, n, n) | only[2].reshape(count, n, 1, n, 1)
+        hidden = grid & only
+        grid = np.where(hidden != 0, hidden, grid).reshape(count, size * size)
+
+        dead |= (grid == 0).any(axis=1)
+        return grid, dead
+
+    def propagate(self, cand: np.ndarray) -> np.ndarray:
+        """Run singles until nothing changes (cand is changed in place)
+
+        Args:
+            cand (np.ndarray): (puzzles, spaces) candidate masks
+
+        Returns:
+            np.ndarray: (puzzles,) True where a puzzle has no solution
+        """
+        dead = np.zeros(len(cand), dtype=bool)
+        active = np.arange(len(cand))
+        while len(active):
+            (step, step_dead) = self._step(cand[active])
+            changed = (step != cand[active]).any(axis=1)
+            cand[active] = step
+            dead[active] |= step_dead
+            active = active[changed & ~step_dead]
+
+        return dead
+
+    def solve(self, puzzles: list) -> list:
+        """Solve a batch of puzzles
+
+        Args:
+            puzzles (list): value lists, row by row (-1 for an empty space)
+
+        Returns:
+            list: the solved values of every puzzle, or None where there is no solution
+        """
+        if not puzzles:
+            return []
+
+        with phase(self.stats, 'vector'):
+            cand = self.candidates(puzzles)
+            dead = self.propagate(cand)
+            solved = (cand & (cand - np.uint64(1))) == 0
+            # a one-bit mask is 2 ** (digit - 1), which frexp reads back as digit
+            values = np.where(solved, np.frexp(cand.astype(np.float64))[1], -1)
+            finished = solved.all(axis=1)
+
+        scalar = PropagationSolver(self.box_size, self.stats)
+        results = []
+        for (number, row) in enumerate(values.tolist()):
+            if dead[number]:
+                results.append(None)
+            elif finished[number]:
+                results.append(row)
+            else:
+                results.append(scalar.solve(row))
+
+        return results
+
+def solve_vector(board, stats=None) -> bool:
+    """Solve a Board in place with the vector engine (a batch of one)
+
+    Args:
+        board (Board): A Sudoku board object
+        stats (SolverStats, optional): metrics to count into. Defaults to None.
+
+    Returns:
+        bool: Does a solution exist
+    """
+    solution = VectorSolver(board.box_size, stats).solve([board.values()])[0]
+    if solution is None:
+        return False
+
+    board.fill(solution)
+    return True
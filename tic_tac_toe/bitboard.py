@@ -0,0 +1,148 @@
+'''
+bitboard.py - TicTacToe game engine on two 9-bit integers
+
+Skills:
+- bit masks (bit n = square n)
+- lookup tables built once at import
+- int.bit_count() (popcount)
+
+Added features:
+- drop-in for TicTacToe: available_moves, empty_squares, num_empty_squares,
+  mark_square, undo_square, winner, board, print_board, position
+- X and O are one int each, so a move is an OR and an undo is an AND
+- a move only checks the 2-4 lines through its own square, each one a
+  single mask compare
+- the available moves of every set of empty squares are worked out at import,
+  so available_moves() is one list lookup
+- position() gives the table the two masks; TranspositionTable canonicalizes
+  them with lookups instead of walking the 9 squares
+'''
+
+FULL = (1 << 9) - 1
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000, # rows
+    0b001001001, 0b010010010, 0b100100100, # columns
+    0b100010001, 0b001010100,              # diagonals
+)
+# the lines through each square
+SQUARE_WINS = tuple(tuple(line for line in WIN_MASKS if line >> square & 1) for square in range(9))
+# empty squares mask -> those squares, lowest first
+MOVES = tuple(tuple(square for square in range(9) if empty >> square & 1) for empty in range(FULL + 1))
+
+
+class BitboardTicTacToe:
+    def __init__(self):
+        self.x = 0
+        self.o = 0
+        self._winner = None
+
+    @property
+    def winner(self):
+        return self._winner
+
+    @winner.setter
+    def winner(self,letter):
+        self._winner = letter
+
+    @property
+    def board(self) -> list:
+        """The 9 squares as ' ' / 'X' / 'O' (a copy - change it through the setter)"""
+        return ['X' if self.x >> square & 1 else 'O' if self.o >> square & 1 else ' ' for square in range(9)]
+
+    @board.setter
+    def board(self,board:list):
+        self.x = sum(1 << square for (square, spot) in enumerate(board) if spot == 'X')
+        self.o = sum(1 << square for (square, spot) in enumerate(board) if spot == 'O')
+        self._winner = None
+
+    def position(self) -> tuple:
+        """What the transposition table keys on
+
+        Returns:
+            tuple: (X mask, O mask)
+        """
+        return (self.x, self.o)
+
+    def print_board(self):
+        """Print the current board
+        """
+        board = self.board
+        for row in [board[i*3:(i+1)*3] for i in range(3)]:
+            print('| ' + ' | '.join(row) + ' |')
+
+    @staticmethod
+    def print_board_nums():
+        """Print the board numbers
+        """
+        number_board = [[str(i) for i in range(j*3, (j+1)*3)] for j in range(3)]
+        for row in number_board:
+            print('| ' + ' | '.join(row) + ' |')
+
+    def available_moves(self) -> tuple:
+        """available_moves
+
+        Returns:
+            tuple: available, valid moves (empty squares), lowest first
+        """
+        return MOVES[FULL & ~(self.x | self.o)]
+
+    def empty_squares(self) -> bool:
+        """Are there any empty squares
+
+        Returns:
+            bool: True if there are empty squares. False if not.
+        """
+        return (self.x | self.o) != FULL
+
+    def num_empty_squares(self) -> int:
+        """Number of empty squares
+
+        Returns:
+            int: the number of empty squares
+        """
+        return 9 - (self.x | self.o).bit_count()
+
+    def mark_square(self,square:int,letter:str) -> bool:
+        """Mark a square with a letter
+
+        Args:
+            square (int): square chosen
+            letter (str): player letter
+
+        Returns:
+            bool: Whether the move was valid
+        """
+        bit = 1 << square
+        if (self.x | self.o) & bit:
+            return False
+
+        if letter == 'X':
+            self.x |= bit
+            mine = self.x
+        else:
+            self.o |= bit
+            mine = self.o
+        for line in SQUARE_WINS[square]:
+            if mine & line == line:
+                self.winner = letter
+                break
+        return True
+
+    def undo_square(self,square:int):
+        """Take a move back (and the win it made, if any)
+
+        Args:
+            square (int): square to empty
+        """
+        keep = ~(1 << square)
+        self.x &= keep
+        self.o &= keep
+        self._winner = None
+
+    def check_winner(self,**kwargs):
+        """Check the whole board for a winner (mark_square already checks each move)
+        """
+        for (letter, mine) in (('X', self.x), ('O', self.o)):
+            if any(mine & line == line for line in WIN_MASKS):
+                self.winner = letter
+                return
@@ -13,8 +13,19 @@ Added features:
 - kwargs (allows check_winner to be called without square/letter)
 - getter/setter
 - commandline arguments
+- several games in a row (--games) with the computer players' transposition
+  tables carried over, and their hit / miss counts and alpha-beta search
+  node counts (--stats)
+- a faster bitboard engine to play on (--engine bitboard, see bitboard.py)
+- optimal players can look their moves up in a solved table instead of
+  searching (--perfect, see perfect.py)
+- bigger boards with k in a row to win (--rows / --cols / -k, see mnk.py),
+  played by a computer that searches as deep as its time budget allows (--budget)
   
 '''
+from bitboard import BitboardTicTacToe
+from mnk import MNKGame, MNKPlayer
+from perfect import PerfectTable
 from player import StrategicComputerPlayer, HumanPlayer, Player
 
 
@@ -31,6 +42,14 @@ class TicTacToe:
     def winner(self,letter):
         self._winner = letter
 
+    def position(self) -> list:
+        """What the transposition table keys on
+
+        Returns:
+            list: the 9 squares
+        """
+        return self.board
+
     def print_board(self):
         """Print the current board
         """
@@ -95,6 +114,15 @@ class TicTacToe:
         
         return False
 
+    def undo_square(self,square:int):
+        """Take a move back (and the win it made, if any)
+
+        Args:
+            square (int): square to empty
+        """
+        self.board[square] = ' '
+        self.winner = None
+
     def check_winner(self,**kwargs):
         """Check for a winner from the last move
 
@@ -181,15 +209,42 @@ if __name__ == '__main__':
     parser.add_argument("-x",action="store_true",help="Set X to be a human player",default=False)
     parser.add_argument("-o",action="store_true",help="Set O to be a human player",default=False)
     parser.add_argument("--strategy","-s",action="store",choices=['corner','side','random','optimal'],type=str,help="Strategy to use",default="optimal")
+    parser.add_argument("--games","-g",action="store",type=int,help="Number of games to play (boards are only printed for one game)",default=1)
+    parser.add_argument("--engine","-e",action="store",choices=['list','bitboard'],type=str,help="Board representation to play on",default="list")
+    parser.add_argument("--perfect","-p",action="store_true",help="Look optimal moves up in the perfect-play table (built on first use)",default=False)
+    parser.add_argument("--rows","-m",action="store",type=int,help="Board rows",default=3)
+    parser.add_argument("--cols","-n",action="store",type=int,help="Board columns",default=3)
+    parser.add_argument("-k",action="store",type=int,help="Marks in a row needed to win",default=3)
+    parser.add_argument("--budget","-b",action="store",type=float,help="Seconds the computer gets per move on bigger boards",default=1.0)
+    parser.add_argument("--stats",action="store_true",help="Print the computer players' transposition table and search node stats at the end",default=False)
     args = parser.parse_args()
-
-    x_player = StrategicComputerPlayer('X',args.strategy)
+    mnk = (args.rows, args.cols, args.k) != (3, 3, 3)
+    if mnk and not 1 <= args.k <= max(args.rows, args.cols):
+        parser.error(f'{args.k} in a row does not fit on a {args.rows}x{args.cols} board')
+
+    perfect = PerfectTable.load() if args.perfect and not mnk else None
+    if mnk:
+        x_player = MNKPlayer('X',args.budget)
+        o_player = MNKPlayer('O',args.budget)
+    else:
+        x_player = StrategicComputerPlayer('X',args.strategy,perfect=perfect)
+        o_player = StrategicComputerPlayer('O',args.strategy,perfect=perfect)
     if args.x:
         x_player = HumanPlayer('X')
-
-    o_player = StrategicComputerPlayer('O',args.strategy)
     if args.o:
         o_player = HumanPlayer('O')
 
-    game = TicTacToe()
-    play(game,x_player,o_player,print_game=True)
\ No newline at end of file
+    for _ in range(args.games):
+        if mnk:
+            game = MNKGame(args.rows,args.cols,args.k)
+        else:
+            game = BitboardTicTacToe() if args.engine == 'bitboard' else TicTacToe()
+        play(game,x_player,o_player,print_game=args.games == 1)
+
+    if args.stats:
+        for player in (x_player, o_player):
+            if isinstance(player, StrategicComputerPlayer):
+                print(f'{player.letter} transposition table: {player.table.stats()}')
+                print(f'{player.letter} nodes searched: {player.total_nodes}')
+            elif isinstance(player, MNKPlayer):
+                print(f'{player.letter} nodes searched: {player.total_nodes} (depth {player.depth} on the last move)')
\ No newline at end of file
@@ -0,0 +1,313 @@
+'''
+mnk.py - m x n boards with k in a row to win, and a time-limited computer player
+
+Skills:
+- precomputed lines (every window of k squares) and per-square lookups
+- iterative deepening
+- alpha-beta search (negamax form)
+- exceptions for control flow (running out of time)
+
+Added features:
+- MNKGame plays like TicTacToe (available_moves, mark_square, undo_square,
+  winner, board, ...) on any board size, e.g. 4x4 with k=4 or 7x7 with k=5
+- every window of k squares is a line; the game keeps how many X and O marks
+  each line holds, so a win is a line reaching k and nothing is rescanned
+- MNKPlayer can't search these trees to the end, so it searches 1 move deep,
+  then 2, ... until its time budget runs out, and plays the best move of the
+  deepest search that finished
+- positions at the depth limit are scored by their open lines (lines only
+  one player has marks in), worth more the fuller they are
+- only empty squares next to a mark are searched (the center on an empty
+  board), ordered by how busy their lines are, with the last best move first
+- a move is picked before the search starts and the clock is checked at
+  every node, so a move always comes back within the budget
+'''
+import math
+import time
+
+from player import Player
+
+WIN = 1 << 40 # beats any open-line score
+
+
+class MNKGame:
+    def __init__(self, rows:int = 3, cols:int = 3, k:int = 3):
+        if not 1 <= k <= max(rows, cols):
+            raise ValueError(f'{k} in a row does not fit on a {rows}x{cols} board')
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.board = [' ' for _ in range(rows * cols)]
+        self._winner = None
+        self.lines = self._lines()
+        # the lines through each square
+        self.square_lines = [[] for _ in self.board]
+        for (number, line) in enumerate(self.lines):
+            for square in line:
+                self.square_lines[square].append(number)
+        # the squares next to each square (diagonals too)
+        self.neighbors = [[r * cols + c
+                           for r in range(max(row - 1, 0), min(row + 2, rows))
+                           for c in range(max(col - 1, 0), min(col + 2, cols))
+                           if (r, c) != (row, col)]
+                          for (row, col) in (divmod(square, cols) for square in range(rows * cols))]
+        # marks each letter has in each line
+        self.counts = { 'X': [0] * len(self.lines), 'O': [0] * len(self.lines) }
+        self.marked = 0
+
+    def _lines(self) -> list:
+        # every run of k squares across, down and along both diagonals
+        lines = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                for (down, across) in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row = row + down * (self.k - 1)
+                    end_col = col + across * (self.k - 1)
+                    if end_row < self.rows and 0 <= end_col < self.cols:
+                        lines.append(tuple((row + down * step) * self.cols + col + across * step for step in range(self.k)))
+        return lines
+
+    @property
+    def winner(self):
+        return self._winner
+
+    @winner.setter
+    def winner(self,letter):
+        self._winner = letter
+
+    def position(self) -> list:
+        """The board as a list of squares, like TicTacToe.position()
+
+        Returns:
+            list: the rows * cols squares, row by row
+        """
+        return self.board
+
+    def print_board(self):
+        """Print the current board
+        """
+        for row in range(self.rows):
+            print('| ' + ' | '.join(self.board[row * self.cols:(row + 1) * self.cols]) + ' |')
+
+    def print_board_nums(self):
+        """Print the board numbers
+        """
+        width = len(str(len(self.board) - 1))
+        for row in range(self.rows):
+            print('| ' + ' | '.join(str(square).rjust(width) for square in range(row * self.cols, (row + 1) * self.cols)) + ' |')
+
+    def available_moves(self) -> list:
+        """available_moves
+
+        Returns:
+            list: List of available, valid moves (empty squares)
+        """
+        return [i for i, spot in enumerate(self.board) if spot == ' ']
+
+    def empty_squares(self) -> bool:
+        """Are there any empty squares
+
+        Returns:
+            bool: True if there are empty squares. False if not.
+        """
+        return self.marked < len(self.board)
+
+    def num_empty_squares(self) -> int:
+        """Number of empty squares
+
+        Returns:
+            int: the number of empty squares
+        """
+        return len(self.board) - self.marked
+
+    def mark_square(self,square:int,letter:str) -> bool:
+        """Mark a square with a letter
+
+        Args:
+            square (int): square chosen
+            letter (str): player letter
+
+        Returns:
+            bool: Whether the move was valid
+        """
+        if self.board[square] != ' ':
+            return False
+
+        self.board[square] = letter
+        self.marked += 1
+        counts = self.counts[letter]
+        for line in self.square_lines[square]:
+            counts[line] += 1
+            if counts[line] == self.k:
+                self.winner = letter
+        return True
+
+    def undo_square(self,square:int):
+        """Take a move back (and the win it made, if any)
+
+        Args:
+            square (int): square to empty
+        """
+        counts = self.counts[self.board[square]]
+        for line in self.square_lines[square]:
+            counts[line] -= 1
+        self.board[square] = ' '
+        self.marked -= 1
+        self.winner = None
+
+    def evaluate(self, letter:str) -> int:
+        """Open-line score of the position for a letter
+
+        A line with marks from only one player can still be won by them, and is
+        worth 4 ** (marks in it) to them.
+
+        Args:
+            letter (str): whose point of view
+
+        Returns:
+            int: the letter's open lines minus the other letter's
+        """
+        other = 'O' if letter == 'X' else 'X'
+        score = 0
+        for (mine, theirs) in zip(self.counts[letter], self.counts[other]):
+            if not theirs:
+                if mine:
+                    score += 4 ** mine
+            elif not mine:
+                score -= 4 ** theirs
+        return score
+
+    def candidates(self) -> list:
+        """Empty squares next to a mark (or the center of an empty board)
+
+        Returns:
+            list: squares worth searching
+        """
+        if not self.marked:
+            return [(self.rows // 2) * self.cols + self.cols // 2]
+        board = self.board
+        return [square for (square, spot) in enumerate(board)
+                if spot == ' ' and any(board[near] != ' ' for near in self.neighbors[square])]
+
+
+class OutOfTime(Exception):
+    pass
+
+
+class MNKPlayer(Player):
+    def __init__(self, letter:str, budget:float = 1.0, max_depth:int = None):
+        """Computer player for MNKGame
+
+        Args:
+            letter (str): 'X' or 'O'
+            budget (float, optional): seconds allowed per move. Defaults to 1.0.
+            max_depth (int, optional): stop deepening here. Defaults to None (only the clock stops it).
+        """
+        super().__init__(letter)
+        self.budget = budget
+        self.max_depth = max_depth
+        self.depth = 0 # deepest finished search for the last move
+        self.nodes = 0 # searched for the last move
+        self.total_nodes = 0
+        self._deadline = 0
+        self._cut = False
+
+    def get_move(self, game, print_game):
+        return self.search(game, self.letter)['position']
+
+    def search(self, game, player:str) -> dict:
+        """Iterative deepening: search deeper and deeper until the time is up
+
+        Args:
+            game (MNKGame): the game
+            player (str): letter to move
+
+        Returns:
+            dict: position, score (for player), depth and nodes searched
+        """
+        # a little of the budget is kept back for unwinding the search and answering
+        self._deadline = time.perf_counter() + self.budget * 0.95
+        self.nodes = 0
+        self.depth = 0
+        moves = self._order(game, player, game.candidates())
+        best = { 'position': moves[0], 'score': None }
+
+        depth = 0
+        while self.max_depth is None or depth < self.max_depth:
+            depth += 1
+            self._cut = False
+            try:
+                (score, move) = self._root(game, player, moves, depth)
+            except OutOfTime:
+                break
+            best = { 'position': move, 'score': score }
+            self.depth = depth
+            # the last best move goes first next time, which makes the deeper search cheaper
+            moves.remove(move)
+            moves.insert(0, move)
+            if not self._cut or abs(score) >= WIN:
+                break # nothing was left unsearched, or the game is decided
+
+        self.total_nodes += self.nodes
+        best['depth'] = self.depth
+        best['nodes'] = self.nodes
+        return best
+
+    def _root(self, game, player:str, moves:list, depth:int) -> tuple:
+        other_player = 'O' if player == 'X' else 'X'
+        alpha = -math.inf
+        best_move = moves[0]
+        for possible_move in moves:
+            score = self._score_move(game, possible_move, player, other_player, depth, alpha, math.inf)
+            if score > alpha:
+                (alpha, best_move) = (score, possible_move)
+        return alpha, best_move
+
+    def _score_move(self, game, square:int, player:str, other_player:str, depth:int, alpha:float, beta:float) -> float:
+        # play square, score the result for player, and take it back again
+        game.mark_square(square, player)
+        try:
+            if game.winner == player:
+                # sooner wins (more empty squares left) are better
+                return WIN + game.num_empty_squares()
+            if not game.empty_squares():
+                return 0
+            return -self._negamax(game, other_player, depth - 1, -beta, -alpha)
+        finally:
+            game.undo_square(square)
+
+    def _negamax(self, game, player:str, depth:int, alpha:float, beta:float) -> float:
+        self.nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise OutOfTime
+        if depth == 0:
+            self._cut = True
+            return game.evaluate(player)
+
+        other_player = 'O' if player == 'X' else 'X'
+        best_score = -math.inf
+        for possible_move in self._order(game, player, game.candidates()):
+            score = self._score_move(game, possible_move, player, other_player, depth, alpha, beta)
+            if score > best_score:
+                best_score = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break # the other player will never let the game get here
+        return best_score
+
+    @staticmethod
+    def _order(game, player:str, moves:list) -> list:
+        # busiest squares first: moves in lines that already hold marks win, block or build
+        other_player = 'O' if player == 'X' else 'X'
+        (mine, theirs) = (game.counts[player], game.counts[other_player])
+
+        def busy(square):
+            total = 0
+            for line in game.square_lines[square]:
+                if not theirs[line]:
+                    total += 4 ** mine[line]
+                elif not mine[line]:
+                    total += 4 ** theirs[line]
+            return total
+
+        return sorted(moves, key=busy, reverse=True)
@@ -0,0 +1,163 @@
+'''
+perfect.py - Solve tic-tac-toe once and keep the answers on disk
+
+Skills:
+- exhaustive search with memoization
+- array module (compact binary files)
+- classmethods as alternate constructors
+
+Added features:
+- every position reachable from the empty board (X first) is solved once,
+  with the same scores as minimax: the number of empty squares + 1 for a
+  win, the negative of that for a loss, 0 for a tie
+- a position's index is its base-3 number (' ' = 0, X = 1, O = 2, square n
+  worth 3 ** n), so the table is a flat array of 3 ** 9 entries and a lookup
+  is one index
+- each entry is 16 bits: the mask of every best move in the low 9 bits and
+  the score (for the player to move, offset by 10) above them; 0 means there
+  is nothing to play (unreachable, won or full)
+- the file is about 38KB and is built the first time it's needed
+  (or with `python perfect.py`)
+- StrategicComputerPlayer answers "optimal" moves from it when given one
+  (game.py --perfect), taking the lowest best square just like minimax
+'''
+import os
+from array import array
+
+from bitboard import BitboardTicTacToe
+from transposition import MASK_CODES
+
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perfect.bin')
+POSITIONS = 3 ** 9
+SCORE_OFFSET = 10 # scores run from -10 to 10
+MOVE_BITS = 9
+MOVE_MASK = (1 << MOVE_BITS) - 1
+LOADED = {}
+
+def index(position) -> int:
+    """Base-3 number of a board
+
+    Args:
+        position (list | tuple): the 9 squares, or (X mask, O mask) - see position() on the games
+
+    Returns:
+        int: index into the table
+    """
+    if isinstance(position, tuple):
+        (x, o) = position
+    else:
+        x = sum(1 << square for (square, spot) in enumerate(position) if spot == 'X')
+        o = sum(1 << square for (square, spot) in enumerate(position) if spot == 'O')
+    return MASK_CODES[0][x] + 2 * MASK_CODES[0][o]
+
+
+class PerfectTable:
+    def __init__(self, entries:array):
+        self.entries = entries
+
+    def __len__(self):
+        # positions with a move to play
+        return sum(1 for entry in self.entries if entry)
+
+    @classmethod
+    def build(cls):
+        """Solve every reachable position
+
+        Returns:
+            PerfectTable: the solved table
+        """
+        entries = array('H', bytes(2 * POSITIONS))
+        solved = set()
+
+        def solve(state, letter, code):
+            # score for letter to move; fills in entries[code]
+            if code in solved:
+                return (entries[code] >> MOVE_BITS) - SCORE_OFFSET
+            other = 'O' if letter == 'X' else 'X'
+            value = 1 if letter == 'X' else 2
+            best = None
+            moves = 0
+            for square in state.available_moves():
+                state.mark_square(square, letter)
+                if state.winner == letter:
+                    score = state.num_empty_squares() + 1
+                elif not state.empty_squares():
+                    score = 0
+                else:
+                    score = -solve(state, other, code + value * 3 ** square)
+                state.undo_square(square)
+
+                if best is None or score > best:
+                    (best, moves) = (score, 0)
+                if score == best:
+                    moves |= 1 << square
+
+            entries[code] = (best + SCORE_OFFSET) << MOVE_BITS | moves
+            solved.add(code)
+            return best
+
+        solve(BitboardTicTacToe(), 'X', 0)
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path:str = TABLE_FILE):
+        """Read a table from disk, building and saving it first if the file is missing
+
+        A table is only read once per path; later calls get the same object.
+
+        Args:
+            path (str, optional): table file. Defaults to TABLE_FILE.
+
+        Returns:
+            PerfectTable: the table
+        """
+        if path not in LOADED:
+            if os.path.exists(path):
+                entries = array('H')
+                with open(path, 'rb') as table_file:
+                    entries.fromfile(table_file, POSITIONS)
+                LOADED[path] = cls(entries)
+            else:
+                LOADED[path] = cls.build()
+                LOADED[path].save(path)
+        return LOADED[path]
+
+    def save(self, path:str = TABLE_FILE) -> None:
+        with open(path, 'wb') as table_file:
+            self.entries.tofile(table_file)
+
+    def lookup(self, position) -> tuple:
+        """Score and best moves of a position
+
+        Args:
+            position (list | tuple): see index()
+
+        Returns:
+            tuple: (score for the player to move, mask of the best squares),
+                   or (None, 0) if there is nothing to play
+        """
+        entry = self.entries[index(position)]
+        if not entry:
+            return (None, 0)
+        return ((entry >> MOVE_BITS) - SCORE_OFFSET, entry & MOVE_MASK)
+
+    def best_move(self, position) -> int:
+        """The lowest of the best squares, or None if there is nothing to play
+        """
+        moves = self.entries[index(position)] & MOVE_MASK
+        if not moves:
+            return None
+        return (moves & -moves).bit_length() - 1
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Solve tic-tac-toe and save the perfect-play table.")
+    parser.add_argument("--output","-o",action="store",type=str,help="Table file to write",default=TABLE_FILE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = PerfectTable.build()
+    table.save(args.output)
+    print(f'{len(table)} positions solved in {time.perf_counter() - started:.2f}s, saved to {args.output} ({os.path.getsize(args.output)} bytes)')
@@ -10,12 +10,43 @@ Skills:
 
 Added features:
 - getter/setter
+- transposition table for minimax (see transposition.py): each position is
+  searched once per player, whichever of its 8 rotations / reflections comes up
+- alpha-beta pruning with move ordering (table move, then center, corners,
+  sides) under both the optimal and the biased strategies, with node counts
+- optional precomputed perfect-play table (see perfect.py): "optimal" moves
+  become a lookup instead of a search
 
 
 '''
 import math
 import random
 
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+# squares each biased strategy likes (a point is added to their score)
+STRATEGY_BONUS = {
+    'corner': (0,2,4,6,8),
+    'side': (1,3,4,5,7),
+}
+# center, then corners, then sides
+MOVE_ORDER = (4,0,2,6,8,1,3,5,7)
+
+def order_moves(moves:list, first:int = None) -> list:
+    """Put the moves most likely to be best first, so alpha-beta cuts off sooner
+
+    Args:
+        moves (list): available squares
+        first (int, optional): a square to try before all the others. Defaults to None.
+
+    Returns:
+        list: the same squares, reordered
+    """
+    ordered = [square for square in MOVE_ORDER if square in moves and square != first]
+    if first in moves:
+        ordered.insert(0, first)
+    return ordered
+
 class Player:
     def __init__(self, letter:str):
         """Initialization function
@@ -58,7 +89,7 @@ class HumanPlayer(Player):
 
         while not valid_square:
             try:
-                val = int(input(self.letter + "\'s turn. Input move [0-8]: "))
+                val = int(input(self.letter + f"\'s turn. Input move [0-{len(game.board) - 1}]: "))
                 if val not in game.available_moves():
                     raise ValueError
                 valid_square = True
@@ -68,9 +99,14 @@ class HumanPlayer(Player):
         return val
 
 class StrategicComputerPlayer(Player):
-    def __init__(self, letter:str,strategy:str):
+    def __init__(self, letter:str,strategy:str,table:TranspositionTable = None,perfect = None):
         super().__init__(letter)
         self._strategy = strategy
+        # kept for the life of the player, so it carries over between moves and games
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0 # searched for the last move
+        self.total_nodes = 0
+        self.perfect = perfect # PerfectTable for "optimal" moves, or None to search
     
     @property
     def strategy(self):
@@ -97,6 +133,8 @@ class StrategicComputerPlayer(Player):
             if self.strategy == "random":
                 # Get a random square
                 square = random.choice(game.available_moves())
+            elif self.strategy == "optimal" and self.perfect is not None:
+                square = self.perfect.best_move(game.position())
             elif self.strategy == "optimal":
                 # Get best move based on minimax algorithm
                 square = self.minimax(game, self.letter)['position']
@@ -106,90 +144,125 @@ class StrategicComputerPlayer(Player):
         return square
 
     def minimax(self, state, player):
-        max_player = self.letter # yourself
-        other_player = 'O' if player == 'X' else 'X' # set opposing player to the other player
+        """Best move for the optimal strategy
 
-        # first, check to see if the previous move was a winner
-        # base case
-        # return position and minimax score so we can keep track of outcomes
-        if state.winner == other_player:
-            # if the _current_ state has a winner, return no position and the appropriate score
-            return {
-                    'position': None,
-                    'score': 1 * (state.num_empty_squares() + 1) if other_player == max_player else -1 * (state.num_empty_squares() + 1)
-                    }
-
-        elif not state.available_moves():
-            # if there is no winner and no available moves, return no position and a score of 0 (tie)
-            return { 'position': None, 'score': 0 }
-
-        if player == max_player:
-            best = { 'position': None, 'score': -math.inf } # (maximize) any new score for you will be better than this
-        else:
-            best = { 'position': None, 'score': math.inf } # (minimize) any new score for the opponent will be 'better' than this
+        Args:
+            state (TicTacToe): the game (player must be this player's letter)
+            player (str): letter to move
+
+        Returns:
+            dict: position, score and the number of nodes searched
+        """
+        return self.search(state, player)
+
+    def multimax(self, state, player, strat):
+        """Best move for a biased strategy ("corner" / "side")
+
+        A preferred square gets one point added to its score before it is compared
+        with the best score so far (which is kept without the bonus).
+
+        Args:
+            state (TicTacToe): the game (player must be this player's letter)
+            player (str): letter to move
+            strat (str): key of STRATEGY_BONUS
+
+        Returns:
+            dict: position, score and the number of nodes searched
+        """
+        return self.search(state, player, STRATEGY_BONUS.get(strat, ()))
+
+    def search(self, state, player, bonus=()):
+        """Pick a move: every root move, in square order, on the alpha-beta core
+
+        A root move only needs an exact score if it beats the best so far, so each
+        one is searched with that as the lower edge of its window. Anything that
+        doesn't beat it comes back as a bound and costs far fewer nodes.
+
+        Args:
+            state (TicTacToe): the game (player must be this player's letter)
+            player (str): letter to move
+            bonus (iterable, optional): squares that get a point added. Defaults to ().
+
+        Returns:
+            dict: position, score and the number of nodes searched
+        """
+        other_player = 'O' if player == 'X' else 'X'
+        self.nodes = 0
+        best = { 'position': None, 'score': -math.inf }
 
         for possible_move in state.available_moves():
-            # step 1: make a move, try the spot
+            # ties keep the earlier square, so a move has to strictly beat the best
+            threshold = best['score'] - (1 if possible_move in bonus else 0)
             state.mark_square(possible_move,player)
-            # step 2: recurse with minimax to simulate the game after making the move
-            sim_score = self.minimax(state,other_player)
-            # step 3: undo the move
-            state.board[possible_move] = ' '
-            state.winner = None
-            sim_score['position'] = possible_move
-            # step 4: update dict if necessary
-            if player == max_player:
-                if sim_score['score'] > best['score']:
-                    best = sim_score
-            else:
-                if sim_score['score'] < best['score']:
-                    best = sim_score
-            
+            score = self.alphabeta(state,other_player,threshold,math.inf)
+            state.undo_square(possible_move)
+            if score > threshold:
+                best = { 'position': possible_move, 'score': score }
+
+        self.total_nodes += self.nodes
+        best['nodes'] = self.nodes
         return best
 
-    def multimax(self, state, player, strat):
+    def alphabeta(self, state, player, alpha, beta):
+        """Minimax score of a position, with alpha-beta pruning
+
+        Scores are for this player: a win is worth the number of empty squares + 1,
+        a loss the negative of that, and a tie 0.
+
+        Args:
+            state (TicTacToe): the game
+            player (str): letter to move
+            alpha (float): score this player is already sure of
+            beta (float): score the opponent is already sure of
+
+        Returns:
+            int: the exact score if it is inside (alpha, beta), otherwise a bound
+                 on the same side of the window
+        """
+        self.nodes += 1
         max_player = self.letter # yourself
         other_player = 'O' if player == 'X' else 'X' # set opposing player to the other player
 
-        # first, check to see if the previous move was a winner
-        # base case
-        # return position and minimax score so we can keep track of outcomes
+        # base case: did the previous move win, or is the board full?
         if state.winner == other_player:
-            # if the _current_ state has a winner, return no position and the appropriate score
-            return {
-                    'position': None,
-                    'score': 1 * (state.num_empty_squares() + 1) if other_player == max_player else -1 * (state.num_empty_squares() + 1)
-                    }
-
-        elif not state.available_moves():
-            # if there is no winner and no available moves, return no position and a score of 0 (tie)
-            return { 'position': None, 'score': 0 }
-
-        if player == max_player:
-            best = { 'position': None, 'score': -math.inf } # (maximize) any new score for you will be better than this
-        else:
-            best = { 'position': None, 'score': math.inf } # (minimize) any new score for the opponent will be 'better' than this
+            empty = state.num_empty_squares() + 1
+            return empty if other_player == max_player else -empty
+        elif not state.empty_squares():
+            return 0
 
-        for possible_move in state.available_moves():
-            # step 1: make a move, try the spot
+        # seen this position (or a rotation / reflection of it) before?
+        key, symmetry, entry = self.table.probe(state.position(), player, max_player)
+        table_move = None
+        if entry is not None:
+            (score, _, bound) = entry
+            if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                return score
+            table_move = self.table.best_move(entry, symmetry)
+
+        (window_alpha, window_beta) = (alpha, beta)
+        best_score = -math.inf if player == max_player else math.inf
+        best_move = None
+        for possible_move in order_moves(state.available_moves(), table_move):
             state.mark_square(possible_move,player)
-            # step 2: recurse with minimax to simulate the game after making the move
-            sim_score = self.minimax(state,other_player)
-            # step 3: undo the move
-            state.board[possible_move] = ' '
-            state.winner = None
-            sim_score['position'] = possible_move
-            # step 4: update dict if necessary
+            score = self.alphabeta(state,other_player,alpha,beta)
+            state.undo_square(possible_move)
+
             if player == max_player:
-                move_score = sim_score['score']
-                if strat == "side" and possible_move in [1,3,4,5,7]:
-                    move_score += 1
-                if strat == "corner" and possible_move in [0,2,4,6,8]:
-                    move_score += 1
-                if move_score > best['score']:
-                    best = sim_score
+                if score > best_score:
+                    (best_score, best_move) = (score, possible_move)
+                alpha = max(alpha, score)
             else:
-                if sim_score['score'] < best['score']:
-                    best = sim_score
-            
-        return best
\ No newline at end of file
+                if score < best_score:
+                    (best_score, best_move) = (score, possible_move)
+                beta = min(beta, score)
+            if alpha >= beta:
+                break # the other side will never let the game get here
+
+        if best_score <= window_alpha:
+            bound = UPPER
+        elif best_score >= window_beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, symmetry, best_score, [best_move], bound)
+        return best_score
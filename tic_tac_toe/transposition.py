@@ -0,0 +1,150 @@
+'''
+transposition.py - Remember searched tic-tac-toe positions
+
+Skills:
+- dictionaries as caches
+- symmetry (rotations / reflections as square permutations)
+- bit masks
+
+Added features:
+- a board is encoded as a base-3 number (' ' = 0, X = 1, O = 2)
+- the board can be rotated and reflected 8 ways; the smallest of the 8
+  numbers is the key, so all 8 versions of a position share one entry
+- an entry holds the score, whether it is exact or only a bound (alpha-beta
+  leaves most scores as bounds) and a mask of the best move(s) in the key's
+  orientation; the move is mapped back to the real board on a hit (the lowest
+  real square if there are several)
+- the table lives as long as the player does, so it keeps paying off
+  across moves and games
+- hit / miss counters
+- boards can also come as (X mask, O mask) from BitboardTicTacToe; every
+  symmetry's base-3 number of every mask is worked out at import, so those
+  are canonicalized with 16 lookups
+'''
+
+def _rotate(square:int) -> int:
+    (row, col) = divmod(square, 3)
+    return col * 3 + (2 - row)
+
+def _reflect(square:int) -> int:
+    (row, col) = divmod(square, 3)
+    return row * 3 + (2 - col)
+
+def _symmetries() -> list:
+    # every symmetry as a list: square -> where that square goes
+    symmetries = []
+    for reflected in (False, True):
+        for turns in range(4):
+            symmetry = []
+            for square in range(9):
+                if reflected:
+                    square = _reflect(square)
+                for _ in range(turns):
+                    square = _rotate(square)
+                symmetry.append(square)
+            symmetries.append(symmetry)
+    return symmetries
+
+SYMMETRIES = _symmetries()
+# weight of each square in the base-3 number, per symmetry
+WEIGHTS = [[3 ** symmetry[square] for square in range(9)] for symmetry in SYMMETRIES]
+LETTER_VALUES = { ' ': 0, 'X': 1, 'O': 2 }
+# per symmetry: 9-bit mask of squares -> base-3 number of those squares (as 1s)
+MASK_CODES = [[sum(weights[square] for square in range(9) if mask >> square & 1) for mask in range(512)]
+              for weights in WEIGHTS]
+# what a stored score means
+EXACT = 0
+LOWER = 1 # the real score is at least this
+UPPER = 2 # the real score is at most this
+
+
+class TranspositionTable:
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def canonical(board:list) -> tuple:
+        """Smallest encoding of a board over its 8 symmetries
+
+        Args:
+            board (list): the 9 squares (' ', 'X' or 'O'), or (X mask, O mask)
+
+        Returns:
+            tuple: (code, index of the symmetry that gives it)
+        """
+        if isinstance(board, tuple):
+            (x, o) = board
+            return min((codes[x] + 2 * codes[o], index) for (index, codes) in enumerate(MASK_CODES))
+
+        values = [LETTER_VALUES[spot] for spot in board]
+        best = None
+        for (index, weights) in enumerate(WEIGHTS):
+            code = sum(weight * value for (weight, value) in zip(weights, values) if value)
+            if best is None or code < best[0]:
+                best = (code, index)
+        return best
+
+    def probe(self, board:list, to_move:str, max_player:str) -> tuple:
+        """Look a position up
+
+        Args:
+            board (list): the 9 squares, or (X mask, O mask)
+            to_move (str): letter whose turn it is
+            max_player (str): letter the scores are for
+
+        Returns:
+            tuple: (key, symmetry, entry) - entry is (score, best move mask, bound) or None
+        """
+        (code, symmetry) = self.canonical(board)
+        key = (code, to_move, max_player)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return key, symmetry, entry
+
+    def store(self, key:tuple, symmetry:int, score:int, moves:list, bound:int = EXACT) -> None:
+        """Remember a searched position
+
+        Args:
+            key (tuple): key from probe()
+            symmetry (int): symmetry from probe()
+            score (int): the position's score
+            moves (list): best move(s), as real squares
+            bound (int, optional): EXACT, LOWER or UPPER. Defaults to EXACT.
+        """
+        mask = 0
+        for move in moves:
+            mask |= 1 << SYMMETRIES[symmetry][move]
+        self._entries[key] = (score, mask, bound)
+
+    @staticmethod
+    def best_move(entry:tuple, symmetry:int) -> int:
+        """The stored best move, back in the real orientation
+
+        Args:
+            entry (tuple): entry from probe()
+            symmetry (int): symmetry from probe()
+
+        Returns:
+            int: the lowest real square among the best moves
+        """
+        mask = entry[1]
+        for (square, target) in enumerate(SYMMETRIES[symmetry]):
+            if mask >> target & 1:
+                return square
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }